@@ -0,0 +1,67 @@
+# Benchmark: clan tag matching, trie matcher vs. the old single alternation regex.
+#   python bench_tag_matcher.py [rounds]
+# Needs the bot's requirements installed (imports bot_welcomecrew; nothing connects).
+
+import random, re, string, sys, time
+
+import bot_welcomecrew as bot
+
+def old_regex(tags):
+    parts = sorted(tags, key=len, reverse=True)
+    alt = "|".join(re.escape(p) for p in parts)
+    return re.compile(rf"(?<![A-Za-z0-9_])(?:{alt})(?![A-Za-z0-9_])", re.IGNORECASE)
+
+def make_tags(n, rnd):
+    tags = set()
+    while len(tags) < n:
+        k = rnd.randint(2, 5)
+        t = "".join(rnd.choice(string.ascii_uppercase + string.digits) for _ in range(k))
+        if rnd.random() < 0.15:
+            t += "-" + "".join(rnd.choice(string.ascii_uppercase) for _ in range(rnd.randint(1, 3)))
+        tags.add(t)
+    return sorted(tags)
+
+WORDS = ("welcome to the clan please read the rules and post your stats here thanks "
+         "moving you over today ping a coordinator if you need help with anything").split()
+
+def make_texts(tags, count, rnd):
+    texts = []
+    for i in range(count):
+        words = [rnd.choice(WORDS) for _ in range(rnd.randint(10, 40))]
+        if i % 3 == 0:  # a third of the messages mention a tag somewhere
+            words.insert(rnd.randrange(len(words) + 1), rnd.choice(tags).lower())
+        texts.append(" ".join(words))
+    return texts
+
+def timed(fn, texts, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for s in texts:
+            fn(s)
+    return (time.perf_counter() - t0) / (rounds * len(texts)) * 1e6
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    rnd = random.Random(1234)
+    print(f"{'tags':>6} {'build regex':>12} {'build trie':>11} {'regex us/msg':>13} {'trie us/msg':>12} {'speedup':>8}")
+    for n in (100, 1_000, 10_000):
+        tags = make_tags(n, rnd)
+        texts = [bot._normalize_dashes(s).upper() for s in make_texts(tags, 600, rnd)]
+
+        t0 = time.perf_counter(); rx = old_regex(tags); b_rx = time.perf_counter() - t0
+        t0 = time.perf_counter(); trie = bot._TagMatcher(tags); b_tr = time.perf_counter() - t0
+
+        def via_regex(s):
+            m = rx.search(s)
+            return m.group(0).upper() if m else None
+
+        bad = [s for s in texts if via_regex(s) != trie.search(s)]
+        if bad:
+            raise SystemExit(f"{n} tags: matchers disagree on {len(bad)} text(s), e.g. {bad[0]!r}")
+
+        us_rx = timed(via_regex, texts, rounds)
+        us_tr = timed(trie.search, texts, rounds)
+        print(f"{n:>6} {b_rx*1e3:>10.1f}ms {b_tr*1e3:>9.1f}ms {us_rx:>13.1f} {us_tr:>12.1f} {us_rx/us_tr:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,23 @@
 # C1C – WelcomeCrew - v1.0.2 (patched: preserve manual data, insert-only toggle)
 
-import os, json, re, asyncio, time, io, random
+import os, json, re, asyncio, time, random, sqlite3, hashlib, functools, logging, tempfile, gzip, shutil, bisect
 from datetime import datetime, timezone as _tz, timedelta as _td
 from typing import Optional, Tuple, Dict, Any, List
-from collections import deque
+from abc import ABC, abstractmethod
+from collections import deque, OrderedDict
 
 import discord
 from discord.ext import commands
-import gspread
-from gspread.exceptions import APIError
+from google.auth import crypt as google_crypt, jwt as google_jwt
 
 try:
     from zoneinfo import ZoneInfo
 except Exception:
     ZoneInfo = None
 
-from aiohttp import web, ClientSession, ClientTimeout
+from aiohttp import web, ClientSession, ClientTimeout, ClientError, TCPConnector
+from urllib.parse import quote
+from yarl import URL
 from discord.ext import tasks
 import sys
 
@@ -38,10 +40,12 @@ CLANLIST_TAG_COLUMN = int(os.getenv("CLANLIST_TAG_COLUMN", "2"))  # 1-based; def
 
 # Scheduled refresh config
 REFRESH_TIMES = os.getenv("REFRESH_TIMES", "02:00,10:00,18:00")  # 24h times, comma-separated
-CLAN_TAGS_CACHE_TTL_SEC = int(os.getenv("CLAN_TAGS_CACHE_TTL_SEC", "28800"))  # 8h default
+CLAN_TAGS_CACHE_TTL_SEC = int(os.getenv("CLAN_TAGS_CACHE_TTL_SEC", "900"))  # 15m default; a refresh is one small read
 LOG_CHANNEL_ID = int(os.getenv("LOG_CHANNEL_ID", "0"))  # optional: where to post "refreshed" pings
 
-SHEETS_THROTTLE_MS = int(os.getenv("SHEETS_THROTTLE_MS", "200"))
+# Sheets quota (Google default: 60 reads + 60 writes per minute per user per project)
+SHEETS_READS_PER_MIN  = int(os.getenv("SHEETS_READS_PER_MIN", "60"))
+SHEETS_WRITES_PER_MIN = int(os.getenv("SHEETS_WRITES_PER_MIN", "60"))
 
 # NEW: safety toggles
 PRESERVE_EXISTING_NONEMPTY = env_bool("PRESERVE_EXISTING_NONEMPTY", True)
@@ -108,10 +112,19 @@ def _print_boot_info():
     print(f"LiveWatch: {ENABLE_LIVE_WATCH} (welcome={ENABLE_LIVE_WATCH_WELCOME}, promo={ENABLE_LIVE_WATCH_PROMO})", flush=True)
 
 # ---------- Sheets ----------
-_gs_client = None
+SHEETS_API_BASE         = "https://sheets.googleapis.com/v4/spreadsheets"
+SHEETS_SCOPE            = "https://www.googleapis.com/auth/spreadsheets"
+SHEETS_HTTP_POOL        = int(os.getenv("SHEETS_HTTP_POOL", "16"))         # pooled connections to Google
+SHEETS_HTTP_TIMEOUT_SEC = int(os.getenv("SHEETS_HTTP_TIMEOUT_SEC", "30"))
+
+_sheets: Optional["SheetsClient"] = None
 _ws_cache: Dict[str, Any] = {}
 _index_simple: Dict[str, Dict[str,int]] = {}  # Sheet1: ticket -> row
 _index_promo:  Dict[str, Dict[str,int]] = {}  # Sheet4: ticket||type||created -> row
+_index_promo_pair: Dict[str, Dict[Tuple[str,str],int]] = {}  # Sheet4: (ticket, type) -> first row
+_promo_cols:   Dict[str, Tuple[int,int,int]] = {}  # Sheet4: (ticket, type, created) column positions
+_promo_rows:   Dict[str, Dict[Any, List[int]]] = {}  # Sheet4: composite key / (ticket, type) -> every row with it
+_mirror:       Dict[str, List[List[str]]] = {}  # tab -> all rows as last read/written (row 1 = header)
 
 HEADERS_SHEET1 = ["ticket number","username","clantag","date closed"]
 HEADERS_SHEET4 = ["ticket number","username","clantag","date closed","type","thread created"]
@@ -123,56 +136,387 @@ def service_account_email() -> str:
     except Exception:
         return ""
 
-def gs_client():
-    global _gs_client
-    if _gs_client is None:
+class SheetsAPIError(Exception):
+    """Non-2xx answer from the Sheets/OAuth endpoints."""
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+class SheetsClient:
+    """Sheets v4 over one pooled aiohttp session; the service-account token is cached until expiry."""
+    def __init__(self, info: dict):
+        self.email = info.get("client_email", "")
+        self._token_uri = info.get("token_uri") or "https://oauth2.googleapis.com/token"
+        self._signer = google_crypt.RSASigner.from_service_account_info(info)
+        self._session: Optional[ClientSession] = None
+        self._token = ""
+        self._token_exp = 0.0
+        self._token_lock = asyncio.Lock()
+        self._meta: Dict[str, dict] = {}
+
+    def _http(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=TCPConnector(limit=SHEETS_HTTP_POOL),
+                timeout=ClientTimeout(total=SHEETS_HTTP_TIMEOUT_SEC),
+            )
+        return self._session
+
+    async def _access_token(self) -> str:
+        if self._token and time.time() < self._token_exp - 60:
+            return self._token
+        async with self._token_lock:
+            if self._token and time.time() < self._token_exp - 60:
+                return self._token
+            now = int(time.time())
+            assertion = google_jwt.encode(self._signer, {
+                "iss": self.email, "scope": SHEETS_SCOPE, "aud": self._token_uri,
+                "iat": now, "exp": now + 3600,
+            })
+            form = {"grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer", "assertion": assertion.decode()}
+            async with self._http().post(self._token_uri, data=form) as r:
+                body = await r.json(content_type=None)
+                if r.status != 200:
+                    raise SheetsAPIError(r.status, f"token exchange failed: {body}")
+            self._token = body["access_token"]
+            self._token_exp = now + int(body.get("expires_in", 3600))
+            return self._token
+
+    async def request(self, method: str, path: str, *, params: Any = None, body: Optional[dict] = None,
+                      probe: bool = False) -> dict:
+        """One Sheets call: circuit check, budget, then HTTP. probe=True is the breaker's own recovery check."""
+        if not probe:
+            _sheets_breaker.check()
+        kind = "read" if method == "GET" else "write"
+        await _sheets_budget.acquire(kind)
+        try:
+            data = await self._send(method, path, kind, params, body)
+        except Exception as e:
+            _sheets_breaker.record_failure(e)
+            raise
+        _sheets_breaker.record_success()
+        return data
+
+    async def _send(self, method: str, path: str, kind: str, params: Any, body: Optional[dict]) -> dict:
+        token = await self._access_token()
+        url = f"{SHEETS_API_BASE}/{path}"
+        async with self._http().request(method, URL(url, encoded=True), params=params, json=body,
+                                        headers={"Authorization": f"Bearer {token}"}) as r:
+            try:
+                data = await r.json(content_type=None) if r.status != 204 else {}
+            except ValueError:
+                data = {"error": {"message": (await r.text())[:200]}}
+            if r.status >= 400:
+                if r.status == 401:
+                    self._token = ""  # force a fresh token next time
+                msg = ((data or {}).get("error") or {}).get("message", "") if isinstance(data, dict) else str(data)
+                ra = r.headers.get("Retry-After")
+                retry_after = float(ra) if ra and ra.replace(".", "", 1).isdigit() else None
+                if r.status == 429:
+                    _sheets_budget.pause(kind, retry_after)
+                raise SheetsAPIError(r.status, msg or r.reason or "error", retry_after=retry_after)
+            return data or {}
+
+    async def spreadsheet_meta(self, spreadsheet_id: str, refresh: bool = False, probe: bool = False) -> dict:
+        if refresh or spreadsheet_id not in self._meta:
+            self._meta[spreadsheet_id] = await self.request(
+                "GET", spreadsheet_id, params={"fields": "properties.title,sheets.properties(sheetId,title)"},
+                probe=probe)
+        return self._meta[spreadsheet_id]
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+class SheetsSpreadsheet:
+    def __init__(self, client: SheetsClient, spreadsheet_id: str, title: str):
+        self.client = client
+        self.id = spreadsheet_id
+        self.title = title
+
+    async def batch_update(self, body: dict) -> dict:
+        return await self.client.request("POST", f"{self.id}:batchUpdate", body=body)
+
+class SheetsWorksheet:
+    """The slice of gspread's Worksheet the bot uses, as coroutines over SheetsClient."""
+    def __init__(self, spreadsheet: SheetsSpreadsheet, title: str, sheet_id: int):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+
+    def _a1(self, rng: str = "") -> str:
+        quoted = "'" + self.title.replace("'", "''") + "'"
+        return f"{quoted}!{rng}" if rng else quoted
+
+    def _values_path(self, rng: str = "", suffix: str = "") -> str:
+        return f"{self.spreadsheet.id}/values/{quote(self._a1(rng), safe='')}{suffix}"
+
+    async def get_values(self, rng: str = "", major: str = "ROWS") -> List[List[str]]:
+        data = await self.spreadsheet.client.request("GET", self._values_path(rng), params={"majorDimension": major})
+        return data.get("values") or []
+
+    async def get_all_values(self) -> List[List[str]]:
+        return await self.get_values()
+
+    async def row_values(self, row: int) -> List[str]:
+        vals = await self.get_values(f"{row}:{row}")
+        return vals[0] if vals else []
+
+    async def col_values(self, col: int) -> List[str]:
+        letter = _col_letter(col)
+        vals = await self.get_values(f"{letter}:{letter}", major="COLUMNS")
+        return vals[0] if vals else []
+
+    async def batch_get(self, ranges: List[str], major: str = "ROWS") -> List[List[List[str]]]:
+        params = [("ranges", self._a1(r)) for r in ranges] + [("majorDimension", major)]
+        data = await self.spreadsheet.client.request("GET", f"{self.spreadsheet.id}/values:batchGet", params=params)
+        return [vr.get("values") or [] for vr in data.get("valueRanges", [])]
+
+    async def update(self, range_name: str, values: List[List[str]], value_input_option: str = "RAW") -> dict:
+        return await self.spreadsheet.client.request(
+            "PUT", self._values_path(range_name), params={"valueInputOption": value_input_option},
+            body={"range": self._a1(range_name), "values": values})
+
+    async def batch_update(self, data: List[dict], value_input_option: str = "RAW") -> dict:
+        body = {"valueInputOption": value_input_option,
+                "data": [{"range": self._a1(d["range"]), "values": d["values"]} for d in data]}
+        return await self.spreadsheet.client.request("POST", f"{self.spreadsheet.id}/values:batchUpdate", body=body)
+
+    async def append_rows(self, rows: List[List[str]], value_input_option: str = "RAW") -> dict:
+        return await self.spreadsheet.client.request(
+            "POST", self._values_path("A1", ":append"), params={"valueInputOption": value_input_option},
+            body={"values": rows})
+
+def _col_letter(n: int) -> str:
+    out = ""
+    while n > 0:
+        n, rem = divmod(n - 1, 26)
+        out = chr(ord("A") + rem) + out
+    return out
+
+def sheets_client() -> SheetsClient:
+    global _sheets
+    if _sheets is None:
         raw = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON") or ""
         if not raw: raise RuntimeError("GOOGLE_SERVICE_ACCOUNT_JSON not set")
-        _gs_client = gspread.service_account_from_dict(json.loads(raw))
-    return _gs_client
+        _sheets = SheetsClient(json.loads(raw))
+    return _sheets
 
-def get_ws(name: str, want_headers: List[str]):
+async def _open_spreadsheet() -> Tuple[SheetsSpreadsheet, dict]:
     if not GSHEET_ID: raise RuntimeError("GSHEET_ID not set")
+    client = sheets_client()
+    meta = await _with_backoff(client.spreadsheet_meta, GSHEET_ID)
+    return SheetsSpreadsheet(client, GSHEET_ID, (meta.get("properties") or {}).get("title", "")), meta
+
+def _sheet_props(meta: dict, name: str) -> Optional[dict]:
+    return next((sh_["properties"] for sh_ in meta.get("sheets", []) if sh_["properties"]["title"] == name), None)
+
+async def _find_ws(name: str) -> Optional[SheetsWorksheet]:
+    """Handle for an existing tab or None; never creates the tab or touches its headers."""
     if name in _ws_cache: return _ws_cache[name]
-    sh = gs_client().open_by_key(GSHEET_ID)
-    try:
-        ws = sh.worksheet(name)
-    except gspread.WorksheetNotFound:
-        ws = sh.add_worksheet(title=name, rows=4000, cols=max(10,len(want_headers)))
-        ws.append_row(want_headers)
+    sh, meta = await _open_spreadsheet()
+    props = _sheet_props(meta, name)
+    return SheetsWorksheet(sh, name, props["sheetId"]) if props else None
+
+async def _open_ws(name: str) -> SheetsWorksheet:
+    """Handle for an existing tab, no header checks (e.g. clanlist)."""
+    ws = await _find_ws(name)
+    if ws is None: raise RuntimeError(f"worksheet {name!r} not found")
+    return ws
+
+async def get_ws(name: str, want_headers: List[str]) -> SheetsWorksheet:
+    if not GSHEET_ID: raise RuntimeError("GSHEET_ID not set")
+    if name in _ws_cache: return _ws_cache[name]
+    sh, meta = await _open_spreadsheet()
+    client = sh.client
+    props = _sheet_props(meta, name)
+    if props is None:
+        resp = await _with_backoff(sh.batch_update, {"requests": [{"addSheet": {"properties": {
+            "title": name, "gridProperties": {"rowCount": 4000, "columnCount": max(10, len(want_headers))}}}}]})
+        props = resp["replies"][0]["addSheet"]["properties"]
+        await client.spreadsheet_meta(GSHEET_ID, refresh=True)
+        ws = SheetsWorksheet(sh, name, props["sheetId"])
+        await _with_backoff(ws.update, "A1", [want_headers])
     else:
+        ws = SheetsWorksheet(sh, name, props["sheetId"])
         try:
-            head = ws.row_values(1)
+            head = await _with_backoff(ws.row_values, 1)
             if [h.strip().lower() for h in head] != [h.strip().lower() for h in want_headers]:
-                # fix gspread warning by using named args
-                ws.update(range_name="A1", values=[want_headers])
+                await _with_backoff(ws.update, "A1", [want_headers])
         except Exception:
             pass
     _ws_cache[name] = ws
     return ws
 
 # ---------- Rate-limit helpers ----------
-def _sleep_ms(ms:int):
-    if ms > 0:
-        time.sleep(ms/1000.0)
+class _TokenBucket:
+    """Per-minute request budget; callers queue FIFO on the lock while the bucket refills."""
+    def __init__(self, per_min: int):
+        self.per_min = max(1, per_min)
+        self.rate = self.per_min / 60.0
+        self.tokens = float(self.per_min)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waiting = 0
+        self.granted = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(float(self.per_min), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if now < self.paused_until:
+                        await asyncio.sleep(self.paused_until - now)
+                        continue
+                    self._refill(now)
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        self.granted += 1
+                        return
+                    await asyncio.sleep((1.0 - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+    def pause(self, seconds: Optional[float]):
+        """Google said 429: stop granting until Retry-After (or a refill period) and start from empty."""
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + (seconds if seconds else 60.0 / self.per_min * 5))
+        self._refill(now)
+        self.tokens = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._refill(now)
+        return {"per_min": self.per_min, "available": int(self.tokens), "waiting": self.waiting,
+                "granted": self.granted, "paused_s": round(max(0.0, self.paused_until - now), 1)}
+
+class _SheetsBudget:
+    """Process-wide read/write budgets shared by live finalizers, backfill and admin commands."""
+    def __init__(self, reads_per_min: int, writes_per_min: int):
+        self.buckets = {"read": _TokenBucket(reads_per_min), "write": _TokenBucket(writes_per_min)}
+
+    async def acquire(self, kind: str):
+        await self.buckets[kind].acquire()
+
+    def pause(self, kind: str, seconds: Optional[float]):
+        self.buckets[kind].pause(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {k: b.snapshot() for k, b in self.buckets.items()}
+
+    def render(self) -> str:
+        parts = []
+        for k, v in self.snapshot().items():
+            part = f"{k} {v['available']}/{v['per_min']}/min"
+            if v["waiting"]: part += f" ({v['waiting']} waiting)"
+            if v["paused_s"]: part += f" (paused {v['paused_s']}s)"
+            parts.append(part)
+        return ", ".join(parts)
+
+_sheets_budget = _SheetsBudget(SHEETS_READS_PER_MIN, SHEETS_WRITES_PER_MIN)
 
 async def _run_blocking(func, /, *args, **kwargs):
     """Offload blocking calls so the Discord loop stays responsive."""
     return await asyncio.to_thread(func, *args, **kwargs)
 
-def _with_backoff(callable_fn, *a, **k):
+SHEETS_RETRY_MAX            = int(os.getenv("SHEETS_RETRY_MAX", "5"))
+SHEETS_BREAKER_FAILS        = int(os.getenv("SHEETS_BREAKER_FAILS", "5"))         # consecutive outage errors to trip
+SHEETS_BREAKER_COOLDOWN_SEC = int(os.getenv("SHEETS_BREAKER_COOLDOWN_SEC", "30"))  # first probe delay (doubles, max 5m)
+
+_RETRY_STATUS  = {429, 500, 502, 503, 504}
+_OUTAGE_STATUS = {500, 502, 503, 504}
+
+class SheetsUnavailable(RuntimeError):
+    """Raised without touching the network while the Sheets circuit is open."""
+
+def _sheets_error_status(e: BaseException) -> Optional[int]:
+    """HTTP status of a Sheets failure; 0 for transport errors (timeout, reset); None if not a Sheets error."""
+    if isinstance(e, SheetsAPIError): return e.status
+    if isinstance(e, (asyncio.TimeoutError, ClientError)): return 0
+    return None
+
+class _CircuitBreaker:
+    """Trips after repeated outage errors; callers fail fast while open and a background probe closes it."""
+    def __init__(self, threshold: int, cooldown: int):
+        self.threshold = max(1, threshold)
+        self.cooldown = max(1, cooldown)
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_error = ""
+        self.trips = 0
+        self._probe: Optional[asyncio.Task] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def check(self):
+        if self.is_open:
+            raise SheetsUnavailable(f"Sheets circuit open for {int(time.time() - self.opened_at)}s: {self.last_error}")
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self, e: BaseException):
+        status = _sheets_error_status(e)
+        if status is None or not (status == 0 or status in _OUTAGE_STATUS):
+            return  # quota (429) and caller errors (4xx) are not outages
+        self.failures += 1
+        self.last_error = f"{type(e).__name__}: {e}"[:200]
+        if self.failures >= self.threshold and not self.is_open:
+            self.opened_at = time.time()
+            self.trips += 1
+            print(f"[sheets] circuit OPEN after {self.failures} failures: {self.last_error}", flush=True)
+            try:
+                self._probe = asyncio.get_running_loop().create_task(self._probe_loop())
+            except RuntimeError:
+                pass
+
+    async def _probe_loop(self):
+        wait = self.cooldown
+        while self.is_open:
+            await asyncio.sleep(wait)
+            try:
+                await sheets_client().spreadsheet_meta(GSHEET_ID, refresh=True, probe=True)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"[:200]
+                wait = min(wait * 2, 300)
+                continue
+            print(f"[sheets] circuit CLOSED after {int(time.time() - self.opened_at)}s", flush=True)
+            self.opened_at = None
+            self.failures = 0
+
+    def render(self) -> str:
+        if self.is_open:
+            return f"OPEN {int(time.time() - self.opened_at)}s ({self.last_error})"
+        return f"closed (trips: {self.trips})"
+
+_sheets_breaker = _CircuitBreaker(SHEETS_BREAKER_FAILS, SHEETS_BREAKER_COOLDOWN_SEC)
+
+async def _with_backoff(callable_fn, *a, **k):
+    """Retry a Sheets coroutine on 429/5xx/transport errors with async jittered backoff."""
     delay = 0.5
-    for attempt in range(6):
+    for attempt in range(SHEETS_RETRY_MAX + 1):
         try:
-            return callable_fn(*a, **k)
-        except Exception as e:
-            msg = str(e).lower()
-            transient = any(tok in msg for tok in ("429", "rate", "timed out", "reset", "500", "502", "503", "504"))
-            if transient and attempt < 5:
-                _sleep_ms(int(delay * 1000 + random.randint(0, 200)))
-                delay = min(delay * 2, 8.0)
-                continue
+            return await callable_fn(*a, **k)
+        except SheetsUnavailable:
             raise
+        except Exception as e:
+            status = _sheets_error_status(e)
+            retryable = status == 0 or status in _RETRY_STATUS
+            if not retryable or attempt >= SHEETS_RETRY_MAX or _sheets_breaker.is_open:
+                raise
+            wait = getattr(e, "retry_after", None) or delay
+            await asyncio.sleep(wait + random.randint(0, 200) / 1000.0)
+            delay = min(delay * 2, 8.0)
 
 # --- HELP CARD (mobile, two-line bullets) ------------------------------------
 try:
@@ -207,9 +551,10 @@ def _mk_help_embed_mobile(guild: discord.Guild | None = None) -> discord.Embed:
     commands_pairs = [
         ("!env_check",        "show required env + hints"),
         ("!sheetstatus",      "tabs + service account email"),
-        ("!backfill_tickets", "scan threads, show live status"),
-        ("!backfill_details", "upload diffs/skips as a file"),
-        ("!dedupe_sheet",     "keep newest entry"),
+        ("!backfill_tickets", "scan new/changed threads (`--full` = all, `--plan` = dry run)"),
+        ("!backfill_resume", "continue an interrupted backfill"),
+        ("!backfill_details", "upload diffs/skips as a file (`plan` = last dry run)"),
+        ("!dedupe_sheet",     "keep newest entry (`preview` = cost only)"),
         ("!watch_status",     "watcher ON/OFF + last actions"),
         ("!reload",           "clear sheet cache"),
         ("!checksheet",       "sheet row counts"),
@@ -237,12 +582,13 @@ async def help_cmd(ctx: commands.Context, *, topic: str = None):
     pages = {
         "env_check": "`!env_check`\nCheck required env vars, toggles, and IDs.",
         "sheetstatus": "`!sheetstatus`\nShow tabs, service account email, and share info.",
-        "backfill_tickets": "`!backfill_tickets`\nScan Welcome & Promo threads and log to Sheets.",
-        "backfill_details": "`!backfill_details`\nExport skipped/updated diffs as a text file.",
-        "dedupe_sheet": "`!dedupe_sheet`\nDelete duplicate tickets in both sheets.",
+        "backfill_tickets": "`!backfill_tickets [--full] [--plan]`\nScan Welcome & Promo threads and log to Sheets. By default only threads that are new or changed since the last run (name, archive time, last message) are analyzed; `--full` re-analyzes every thread. Both channels are scanned concurrently (`BACKFILL_WORKERS`). `--plan` is a dry run: planned inserts/updates, diffs and Sheets request cost from one snapshot per tab, with no writes (diffs: `!backfill_details plan`).",
+        "backfill_resume": "`!backfill_resume`\nContinue the last stopped or interrupted backfill from its checkpoint. Finished threads are not re-analyzed and the counters carry on.",
+        "backfill_details": "`!backfill_details [plan]`\nExport skipped/updated diffs of the last backfill as a text file. `plan` exports the last `--plan` dry run instead.",
+        "dedupe_sheet": "`!dedupe_sheet [preview]`\nDelete duplicate tickets in both sheets (one batch request per sheet). `preview` only shows dupes and request cost.",
         "watch_status": "`!watch_status`\nShow ON/OFF state of watchers and last 5 actions.",
         "reload": "`!reload`\nClear cache so next call reopens Sheets fresh.",
-        "checksheet": "`!checksheet`\nRow counts for both sheets.",
+        "checksheet": "`!checksheet`\nRow counts for both tabs in the active ticket store (header excluded).",
         "health": "`!health`\nShow bot latency, Sheets health, and uptime.",
         "reboot": "`!reboot`\nSoft restart the bot.",
         "ping": "`!ping`\nSimple bot-alive check (Pong).",
@@ -253,7 +599,6 @@ async def help_cmd(ctx: commands.Context, *, topic: str = None):
 
     txt = pages.get(topic)
     if not txt:
-        import logging
         log = logging.getLogger("welcomecrew")
         log.warning("Unknown help topic requested: %s", topic)
         return
@@ -280,7 +625,7 @@ async def setup_hook():
     except Exception as e:
         print(f"Slash sync failed: {e}", flush=True)
     try:
-        await _run_blocking(_load_clan_tags, True)
+        await _load_clan_tags(True)
     except Exception as e:
         print(f"Clan tag preload failed: {e}", flush=True)
 
@@ -288,7 +633,7 @@ async def setup_hook():
 _clan_tags_cache: List[str] = []
 _clan_tags_norm_set: set = set()
 _last_clan_fetch = 0.0
-_tag_regex_cache = None
+_tag_matcher = None
 
 def _normalize_dashes(s: str) -> str:
     return re.sub(r"[\u2010\u2011\u2012\u2013\u2014\u2015]", "-", s or "")
@@ -296,54 +641,115 @@ def _normalize_dashes(s: str) -> str:
 def _fmt_ticket(s: str) -> str:
     return (s or "").strip().lstrip("#").zfill(4)
 
-def _load_clan_tags(force: bool=False) -> List[str]:
-    global _clan_tags_cache, _clan_tags_norm_set, _last_clan_fetch, _tag_regex_cache
+_clan_tag_col: Optional[int] = None  # 0-based tag column, learned from the header
+_clan_tags_hash = ""
+
+def _clan_tag_col_from_header(header: List[str]) -> int:
+    header = [h.strip().lower() for h in header]
+    for key in ("clantag", "tag", "abbr", "code"):
+        if key in header:
+            return header.index(key)
+    return max(0, CLANLIST_TAG_COLUMN - 1)
+
+async def _fetch_clan_tag_cells() -> List[str]:
+    """Header row + the tag column only (one batchGet); a second read only if the tag column moved."""
+    global _clan_tag_col
+    ws = await _open_ws(CLANLIST_TAB_NAME)
+    col = _clan_tag_col if _clan_tag_col is not None else max(0, CLANLIST_TAG_COLUMN - 1)
+    letter = _col_letter(col + 1)
+    head, cells = await _with_backoff(ws.batch_get, ["1:1", f"{letter}2:{letter}"], major="COLUMNS")
+    header = [c[0] if c else "" for c in head]
+    actual = _clan_tag_col_from_header(header)
+    if actual != col:
+        letter = _col_letter(actual + 1)
+        cells = await _with_backoff(ws.get_values, f"{letter}2:{letter}", major="COLUMNS")
+    _clan_tag_col = actual
+    return cells[0] if cells else []
+
+_TAG_WORD_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_")
+
+class _TagMatcher:
+    """Trie over normalized (dash-fixed, upper-case) tags. search() returns the leftmost match whose
+    neighbours are not [A-Za-z0-9_], preferring the longest tag at that position (F-IT over F)."""
+    def __init__(self, tags: List[str]):
+        self.root: Dict[str, Any] = {}
+        for t in tags:
+            if not t: continue
+            node = self.root
+            for ch in t:
+                node = node.setdefault(ch, {})
+            node[""] = t  # "" never collides with a one-char edge
+        # Candidate starts: a tag's first character not preceded by a word character (scanned in C)
+        firsts = "".join(re.escape(c) for c in self.root)
+        self._starts = re.compile(rf"(?<![A-Za-z0-9_])[{firsts}]") if firsts else None
+
+    def search(self, s: str) -> Optional[str]:
+        if not self._starts: return None
+        n = len(s)
+        for m in self._starts.finditer(s):
+            node, j, best = self.root, m.start(), None
+            while j < n:
+                node = node.get(s[j])
+                if node is None: break
+                j += 1
+                if "" in node and (j == n or s[j] not in _TAG_WORD_CHARS):
+                    best = node[""]
+            if best: return best
+        return None
+
+_clan_tags_gen = 0  # bumped whenever the tag list changes; part of the thread-name parse cache key
+
+def _rebuild_tag_matcher():
+    global _tag_matcher, _clan_tags_gen
+    _tag_matcher = _TagMatcher([_normalize_dashes(t).upper() for t in _clan_tags_cache]) if _clan_tags_cache else None
+    _clan_tags_gen += 1
+    _parse_welcome_cached.cache_clear(); _parse_promo_cached.cache_clear()
+
+async def _load_clan_tags(force: bool=False) -> List[str]:
+    global _clan_tags_cache, _clan_tags_norm_set, _last_clan_fetch, _clan_tags_hash
     now = time.time()
     if not force and _clan_tags_cache and (now - _last_clan_fetch < CLAN_TAGS_CACHE_TTL_SEC):
         return _clan_tags_cache
 
-    tags: List[str] = []
     try:
-        sh = gs_client().open_by_key(GSHEET_ID)
-        ws = sh.worksheet(CLANLIST_TAB_NAME)
-        values = ws.get_all_values() or []
-        if values:
-            header = [h.strip().lower() for h in values[0]] if values else []
-            col_idx = None
-            for key in ("clantag", "tag", "abbr", "code"):
-                if key in header:
-                    col_idx = header.index(key)
-                    break
-            if col_idx is None:
-                col_idx = max(0, CLANLIST_TAG_COLUMN - 1)
-            for row in values[1:]:
-                cell = row[col_idx] if col_idx < len(row) else ""
-                t = _normalize_dashes(cell).strip().upper()
-                if t:
-                    tags.append(t)
-
-        _clan_tags_cache = list(dict.fromkeys(tags))
-        _clan_tags_norm_set = { _normalize_dashes(t).upper() for t in _clan_tags_cache }
+        tags: List[str] = []
+        for cell in await _fetch_clan_tag_cells():
+            t = _normalize_dashes(cell).strip().upper()
+            if t:
+                tags.append(t)
+        tags = list(dict.fromkeys(tags))
+        digest = hashlib.sha1("\n".join(tags).encode("utf-8")).hexdigest()
         _last_clan_fetch = now
+        if digest == _clan_tags_hash and _clan_tags_cache:
+            return _clan_tags_cache  # unchanged: keep cache, norm set and matcher as they are
 
-        parts = sorted((_normalize_dashes(t).upper() for t in _clan_tags_cache), key=len, reverse=True)
-        if parts:
-            alt = "|".join(re.escape(p) for p in parts)
-            _tag_regex_cache = re.compile(rf"(?<![A-Za-z0-9_])(?:{alt})(?![A-Za-z0-9_])", re.IGNORECASE)
-        else:
-            _tag_regex_cache = None
+        _clan_tags_cache = tags
+        _clan_tags_norm_set = { _normalize_dashes(t).upper() for t in _clan_tags_cache }
+        _clan_tags_hash = digest
+        _rebuild_tag_matcher()
     except Exception as e:
+        # keep the last good list; try again in a minute rather than on every lookup
         print("Failed to load clanlist:", e, flush=True)
-        _clan_tags_cache = []; _clan_tags_norm_set = set(); _tag_regex_cache = None
+        _last_clan_fetch = now - max(0, CLAN_TAGS_CACHE_TTL_SEC - 60)
+    return _clan_tags_cache
+
+_clan_refresh_task: Optional[asyncio.Task] = None
+
+def _clan_tags() -> List[str]:
+    """Cached tags for sync hot paths; a lapsed TTL schedules a background reload instead of blocking."""
+    global _clan_refresh_task
+    if time.time() - _last_clan_fetch >= CLAN_TAGS_CACHE_TTL_SEC and (_clan_refresh_task is None or _clan_refresh_task.done()):
+        try:
+            _clan_refresh_task = asyncio.get_running_loop().create_task(_load_clan_tags(False))
+        except RuntimeError:
+            pass  # no loop (import-time / tooling); stay on the cache
     return _clan_tags_cache
 
 def _match_tag_in_text(text: str) -> Optional[str]:
     if not text: return None
-    _load_clan_tags(False)
-    if not _tag_regex_cache: return None
-    s = _normalize_dashes(text).upper()
-    m = _tag_regex_cache.search(s)
-    return m.group(0).upper() if m else None
+    _clan_tags()
+    if not _tag_matcher: return None
+    return _tag_matcher.search(_normalize_dashes(text).upper())
 
 def _pick_tag_by_suffix(remainder: str, known_tags: List[str]) -> Optional[Tuple[str, str]]:
     s = _normalize_dashes(remainder).strip()
@@ -363,36 +769,117 @@ def _pick_tag_by_suffix(remainder: str, known_tags: List[str]) -> Optional[Tuple
 def _key_promo(ticket: str, typ: str, created: str) -> str:
     return f"{_fmt_ticket(ticket)}||{(typ or '').strip().lower()}||{(created or '').strip()}"
 
-def ws_index_welcome(name: str, ws) -> Dict[str,int]:
+async def _load_mirror(name: str, ws) -> List[List[str]]:
+    """One bulk read of the whole tab; the mirror then answers "before" rows locally."""
+    values = await _with_backoff(ws.get_all_values) or []
+    _mirror[name] = values
+    return values
+
+def _mirror_row(name: str, row: int) -> Optional[List[str]]:
+    rows = _mirror.get(name)
+    if rows is None or not (1 <= row <= len(rows)):
+        return None
+    vals = list(rows[row-1])
+    while vals and vals[-1] == "":
+        vals.pop()  # match row_values(): no trailing blanks
+    return vals
+
+def _mirror_put(name: str, row: int, values: List[str]):
+    rows = _mirror.get(name)
+    if rows is None: return
+    while len(rows) < row:
+        rows.append([])
+    rows[row-1] = list(values)
+
+def _index_welcome_values(name: str, values: List[List[str]]) -> Dict[str,int]:
     idx = {}
-    try:
-        colA = ws.col_values(1)[1:]
-        for i, val in enumerate(colA, start=2):
-            t = _fmt_ticket(val)
-            if t: idx[t] = i
-    except Exception: pass
+    for i, row in enumerate(values[1:], start=2):
+        t = _fmt_ticket(row[0] if row else "")
+        if t: idx[t] = i
     _index_simple[name] = idx
     return idx
 
-def ws_index_promo(name: str, ws) -> Dict[str,int]:
-    idx = {}
+def _index_read_failed(name: str, *indexes: Dict[str, Any]):
+    """Forget a tab whose read failed: an empty index would make every existing ticket look new,
+    so nothing is cached and the next lookup reads again."""
+    for idx in indexes: idx.pop(name, None)
+    _mirror.pop(name, None)
+
+async def ws_index_welcome(name: str, ws) -> Dict[str,int]:
     try:
-        values = ws.get_all_values()
-        if not values: return {}
+        values = await _load_mirror(name, ws)
+    except Exception:
+        _index_read_failed(name, _index_simple)
+        raise
+    return _index_welcome_values(name, values)
+
+def _promo_fields(name: str, row: List[str]) -> Tuple[str, str, str]:
+    col_ticket, col_type, col_created = _promo_cols.get(name, (0, 4, 5))
+    t   = _fmt_ticket(row[col_ticket]  if col_ticket  < len(row) else "")
+    typ = (row[col_type]    if col_type    < len(row) else "").strip().lower()
+    cr  = (row[col_created] if col_created < len(row) else "").strip()
+    return t, typ, cr
+
+def _index_promo_values(name: str, values: List[List[str]]) -> Dict[str,int]:
+    idx: Dict[str,int] = {}
+    pairs: Dict[Tuple[str,str],int] = {}
+    rows: Dict[Any, List[int]] = {}
+    if values:
         header = [h.strip().lower() for h in values[0]]
-        col_ticket  = header.index("ticket number") if "ticket number" in header else 0
-        col_type    = header.index("type") if "type" in header else 4
-        col_created = header.index("thread created") if "thread created" in header else 5
+        _promo_cols[name] = (
+            header.index("ticket number") if "ticket number" in header else 0,
+            header.index("type") if "type" in header else 4,
+            header.index("thread created") if "thread created" in header else 5,
+        )
         for r_i, row in enumerate(values[1:], start=2):
-            t   = _fmt_ticket(row[col_ticket]  if col_ticket  < len(row) else "")
-            typ = (row[col_type]    if col_type    < len(row) else "").strip().lower()
-            cr  = (row[col_created] if col_created < len(row) else "").strip()
+            t, typ, cr = _promo_fields(name, row)
             if t:
                 idx[_key_promo(t, typ, cr)] = r_i
-    except Exception: pass
+                pairs.setdefault((t, typ), r_i)
+                rows.setdefault(_key_promo(t, typ, cr), []).append(r_i)
+                rows.setdefault((t, typ), []).append(r_i)
     _index_promo[name] = idx
+    _index_promo_pair[name] = pairs
+    _promo_rows[name] = rows
     return idx
 
+async def ws_index_promo(name: str, ws) -> Dict[str,int]:
+    try:
+        values = await _load_mirror(name, ws)
+    except Exception:
+        _index_read_failed(name, _index_promo, _index_promo_pair, _promo_rows)
+        raise
+    return _index_promo_values(name, values)
+
+def _promo_rows_add(name: str, t: str, typ: str, cr: str, row: int):
+    rows = _promo_rows.setdefault(name, {})
+    for k in (_key_promo(t, typ, cr), (t, typ)):
+        bisect.insort(rows.setdefault(k, []), row)
+
+def _reindex_promo_row(name: str, row: int, before: List[str], after: List[str]):
+    """Move one row's entries in both Sheet4 indexes after we rewrote it. The row lists per key
+    keep duplicates visible: an entry this row owned goes to the next row that still has the key
+    (last row for a composite key, first for a pair, as a full index build picks them)."""
+    idx = _index_promo.get(name); pairs = _index_promo_pair.get(name); rows = _promo_rows.get(name)
+    if idx is None or pairs is None or rows is None: return
+    t0, typ0, cr0 = _promo_fields(name, before)
+    t1, typ1, cr1 = _promo_fields(name, after)
+    if (t0, typ0, cr0) == (t1, typ1, cr1): return
+    if t0:
+        key0 = _key_promo(t0, typ0, cr0)
+        for k, table, pick in ((key0, idx, -1), ((t0, typ0), pairs, 0)):
+            left = rows.get(k, [])
+            if row in left: left.remove(row)
+            if not left: rows.pop(k, None)
+            if table.get(k) == row:
+                if left: table[k] = left[pick]
+                else: table.pop(k, None)
+    if t1:
+        _promo_rows_add(name, t1, typ1, cr1, row)
+        key1 = _key_promo(t1, typ1, cr1)
+        idx[key1] = rows[key1][-1]
+        pairs[(t1, typ1)] = rows[(t1, typ1)][0]
+
 # ---------- Diff helpers ----------
 def _calc_diffs(header: List[str], before: List[str], after: List[str]) -> List[str]:
     diffs = []
@@ -415,133 +902,435 @@ def _merge_preserve_nonempty(before: List[str], incoming: List[str]) -> List[str
 # ---------- Backfill state ----------
 def _new_bucket():
     return {
-        "scanned":0,"added":0,"updated":0,"skipped":0,
+        "scanned":0,"cached":0,"history_skipped":0,"added":0,"updated":0,"unchanged":0,"skipped":0,
         "added_ids":[], "updated_ids":[], "skipped_ids":[],
         "updated_details":[],
         "skipped_reasons":{}
     }
 
+BACKFILL_SAMPLE_MAX = int(os.getenv("BACKFILL_SAMPLE_MAX", "10"))  # ids per list kept for the summary
+
+def _new_report_bucket():
+    """Per-channel totals of a run: counters plus the first BACKFILL_SAMPLE_MAX ids of each list.
+    Diffs and skip reasons are streamed to disk (_details_spill) instead of kept here."""
+    b = _new_bucket()
+    del b["updated_details"], b["skipped_reasons"]
+    return b
+
 backfill_state = {
     "running": False,
-    "welcome": _new_bucket(),
-    "promo":   _new_bucket(),
+    "full": False,
+    "plan": False,
+    "welcome": _new_report_bucket(),
+    "promo":   _new_report_bucket(),
     "last_msg": ""
 }
+# A --plan dry run reports here instead, so it never replaces the last real run's report
+backfill_plan_state = {"full": False, "welcome": _new_report_bucket(), "promo": _new_report_bucket(), "last_msg": ""}
+
+def _run_state() -> Dict[str, Any]:
+    """Report of the current (or last real) run: backfill_plan_state while a --plan run is on."""
+    return backfill_plan_state if backfill_state["plan"] else backfill_state
+
+# ---------- Local state DB (SQLite) ----------
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "welcomecrew_state.db")
+
+_state_conn: Optional[sqlite3.Connection] = None
+
+def _state_db() -> sqlite3.Connection:
+    global _state_conn
+    if _state_conn is None:
+        conn = sqlite3.connect(STATE_DB_PATH, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, tab TEXT NOT NULL, ticket TEXT NOT NULL,"
+            " typ TEXT NOT NULL DEFAULT '', created TEXT NOT NULL DEFAULT '', row TEXT NOT NULL,"
+            " ts REAL NOT NULL, committed INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS journal_pending ON journal(committed, id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS row_fingerprints ("
+            " tab TEXT NOT NULL, key TEXT NOT NULL, fp TEXT NOT NULL, ts REAL NOT NULL,"
+            " PRIMARY KEY (tab, key))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS thread_fingerprints ("
+            " thread_id INTEGER PRIMARY KEY, scope TEXT NOT NULL, fp TEXT NOT NULL, ts REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS backfill_runs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, started REAL NOT NULL, full INTEGER NOT NULL,"
+            " status TEXT NOT NULL, cursors TEXT NOT NULL DEFAULT '{}', updated REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS backfill_done ("
+            " run_id INTEGER NOT NULL, thread_id INTEGER NOT NULL, scope TEXT NOT NULL, bucket TEXT NOT NULL,"
+            " PRIMARY KEY (run_id, thread_id))"
+        )
+        _state_conn = conn
+    return _state_conn
+
+# ---------- Row fingerprints ----------
+_fingerprints: Dict[str, Dict[str, str]] = {}  # tab -> key -> fingerprint of the last row we delivered
 
-# ---------- Upserts (throttled + backoff) ----------
-def upsert_welcome(name: str, ws, ticket: str, rowvals: List[str], st_bucket: dict) -> str:
+def _row_fp(values: List[str]) -> str:
+    vals = [(v or "").strip() for v in values]
+    while vals and vals[-1] == "":
+        vals.pop()
+    return hashlib.sha1("\x1f".join(vals).encode("utf-8")).hexdigest()
+
+def _fp_table(name: str) -> Dict[str, str]:
+    fps = _fingerprints.get(name)
+    if fps is None:
+        try:
+            rows = _state_db().execute("SELECT key, fp FROM row_fingerprints WHERE tab=?", (name,)).fetchall()
+        except Exception as e:
+            print(f"[fingerprints] load failed: {type(e).__name__}: {e}", flush=True)
+            rows = []
+        fps = _fingerprints[name] = dict(rows)
+    return fps
+
+def fp_matches(name: str, key: str, values: List[str]) -> bool:
+    """True when this exact incoming row was already delivered for key."""
+    return _fp_table(name).get(key) == _row_fp(values)
+
+def fp_clear(*names: str):
+    """Forget delivered-row fingerprints (all tabs when no names given): the sheet changed under them."""
+    try:
+        if names:
+            for name in names:
+                _fingerprints.pop(name, None)
+                _state_db().execute("DELETE FROM row_fingerprints WHERE tab=?", (name,))
+        else:
+            _fingerprints.clear()
+            _state_db().execute("DELETE FROM row_fingerprints")
+    except Exception as e:
+        print(f"[fingerprints] clear failed: {type(e).__name__}: {e}", flush=True)
+
+def fp_put(name: str, key: str, values: List[str]):
+    fp = _row_fp(values)
+    fps = _fp_table(name)
+    if fps.get(key) == fp: return
+    fps[key] = fp
+    try:
+        _state_db().execute(
+            "INSERT INTO row_fingerprints(tab, key, fp, ts) VALUES (?,?,?,?)"
+            " ON CONFLICT(tab, key) DO UPDATE SET fp=excluded.fp, ts=excluded.ts",
+            (name, key, fp, time.time()),
+        )
+    except Exception as e:
+        print(f"[fingerprints] save failed: {type(e).__name__}: {e}", flush=True)
+
+# ---------- Write-behind queue ----------
+SHEETS_FLUSH_MS       = int(os.getenv("SHEETS_FLUSH_MS", "1500"))     # coalescing window per tab
+SHEETS_FLUSH_MAX_ROWS = int(os.getenv("SHEETS_FLUSH_MAX_ROWS", "200"))  # flush early once this many rows wait
+
+def _row_range(row: int, width: int) -> str:
+    return f"A{row}:{chr(ord('A')+width-1)}{row}"
+
+class _WriteBehind:
+    """Pending row writes for one tab; each flush is one batch_update + one append_rows."""
+    def __init__(self, name: str):
+        self.name = name
+        self.ws = None
+        self.updates: Dict[int, Dict[str, Any]] = {}  # row -> {"values", "waiters"}
+        self.inserts: Dict[str, Dict[str, Any]] = {}  # key -> {"values", "waiters"}
+        self.inflight: Dict[Any, asyncio.Future] = {}  # key / promo (ticket, type) -> append in progress
+        self.updating: Dict[int, List[str]] = {}  # row -> values of the batch_update in progress
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def pending_update(self, row: int) -> Optional[List[str]]:
+        """Values queued for this row, or those being sent (the mirror only has them once they land)."""
+        ent = self.updates.get(row)
+        if ent: return list(ent["values"])
+        sending = self.updating.get(row)
+        return list(sending) if sending is not None else None
+
+    def pending_insert(self, key: str) -> Optional[List[str]]:
+        ent = self.inserts.get(key)
+        return list(ent["values"]) if ent else None
+
+    async def insert_settled(self, key) -> bool:
+        """Wait out an append that is carrying this key; True if there was one (the caller re-resolves its row)."""
+        fut = self.inflight.get(key)
+        if fut is None: return False
+        await asyncio.shield(fut)
+        return True
+
+    def submit(self, ws, values: List[str], settle, row: int = 0, key: str = "") -> "asyncio.Future[str]":
+        """Queue a row write (update when row > 0, else insert keyed by key); later values replace earlier."""
+        self.ws = ws
+        fut = asyncio.get_running_loop().create_future()
+        slot = self.updates if row > 0 else self.inserts
+        ent = slot.setdefault(row if row > 0 else key, {"values": values, "waiters": []})
+        ent["values"] = values
+        ent["waiters"].append((fut, settle))
+        if len(self.updates) + len(self.inserts) >= SHEETS_FLUSH_MAX_ROWS:
+            asyncio.create_task(self.flush())
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+        return fut
+
+    async def exclusive(self, fn):
+        """Drain the queue, then run `fn()` with no flush landing until it returns (bulk row rewrites)."""
+        await self.flush()
+        async with self._lock:
+            return await fn()
+
+    def rebase(self, deleted: List[int], resolve):
+        """Rows were deleted under the queue: move pending updates to their new row numbers. An update
+        aimed at a deleted row goes to `resolve(values)` -> (row or None, insert key) instead."""
+        gone = sorted(set(deleted))
+        updates, self.updates = self.updates, {}
+        for r, ent in updates.items():
+            if r in gone:
+                row, key = resolve(ent["values"])
+            else:
+                row, key = r - bisect.bisect_left(gone, r), ""
+            slot = self.updates if row else self.inserts
+            prev = slot.get(row or key)
+            if prev: ent["waiters"] = prev["waiters"] + ent["waiters"]
+            slot[row or key] = ent
+
+    async def _flush_later(self):
+        await asyncio.sleep(SHEETS_FLUSH_MS / 1000.0)
+        await self.flush()
+
+    def _settle(self, entries, status: str, err: Optional[Exception] = None):
+        for ent in entries:
+            for fut, settle in ent["waiters"]:
+                try:
+                    if settle: settle(status, err)
+                except Exception as e:
+                    print(f"[sheets] settle callback failed: {e}", flush=True)
+                if not fut.done():
+                    fut.set_result(status)
+
+    async def flush(self):
+        async with self._lock:
+            if self._timer and not self._timer.done() and self._timer is not asyncio.current_task():
+                self._timer.cancel()
+            self._timer = None
+            updates, self.updates = self.updates, {}
+            inserts, self.inserts = self.inserts, {}
+            ws = self.ws
+            # Until the append lands and the index knows its rows, these keys are in neither place
+            landed = asyncio.get_running_loop().create_future()
+            carried = list(inserts)
+            if self.name == SHEET4_NAME:
+                carried += [_promo_fields(self.name, ent["values"])[:2] for ent in inserts.values()]
+            for k in carried: self.inflight[k] = landed
+            self.updating = {r: ent["values"] for r, ent in updates.items()}
+            try:
+                if updates:
+                    data = [{"range": _row_range(r, len(ent["values"])), "values": [ent["values"]]}
+                            for r, ent in sorted(updates.items())]
+                    try:
+                        await _with_backoff(ws.batch_update, data)
+                        for r, ent in updates.items():
+                            if self.name == SHEET4_NAME:
+                                _reindex_promo_row(self.name, r, _mirror_row(self.name, r) or [], ent["values"])
+                            _mirror_put(self.name, r, ent["values"])
+                        self._settle(updates.values(), "updated")
+                    except Exception as e:
+                        self._settle(updates.values(), "error", e)
+                if inserts:
+                    try:
+                        rows = [ent["values"] for ent in inserts.values()]
+                        resp = await _with_backoff(ws.append_rows, rows, value_input_option="RAW")
+                    except Exception as e:
+                        self._settle(inserts.values(), "error", e)
+                    else:
+                        first = _appended_first_row(resp)
+                        if first:
+                            _after_inserts(self.name, list(inserts.keys()), rows, first)
+                        else:
+                            await _reindex_after_unknown_append(self.name, ws, list(inserts.keys()))
+                        self._settle(inserts.values(), "inserted")
+            finally:
+                self.updating = {}
+                for k in carried:
+                    if self.inflight.get(k) is landed: del self.inflight[k]
+                landed.set_result(None)
+
+_write_queues: Dict[str, _WriteBehind] = {}
+
+def _write_queue(name: str) -> _WriteBehind:
+    q = _write_queues.get(name)
+    if q is None:
+        q = _write_queues[name] = _WriteBehind(name)
+    return q
+
+async def flush_writes(*names: str):
+    """Send everything still waiting in the write-behind queues (all tabs when no names given)."""
+    for name in (names or list(_write_queues)):
+        q = _write_queues.get(name)
+        if q: await q.flush()
+
+_UPDATED_RANGE_RX = re.compile(r"![A-Za-z]+(\d+)")
+
+def _appended_first_row(resp) -> Optional[int]:
+    """First sheet row written by an append, from the response's updates.updatedRange."""
+    try:
+        m = _UPDATED_RANGE_RX.search(resp["updates"]["updatedRange"])
+        return int(m.group(1)) if m else None
+    except Exception:
+        return None
+
+def _after_inserts(name: str, keys: List[str], rows: List[List[str]], first: int):
+    """Patch mirror + indexes with the rows an append just wrote at first..first+n-1."""
+    for off, (key, values) in enumerate(zip(keys, rows)):
+        r = first + off
+        _mirror_put(name, r, values)
+        if name == SHEET4_NAME:
+            t, typ, cr = _promo_fields(name, values)
+            _index_promo.setdefault(name, {})[key] = r
+            _index_promo_pair.setdefault(name, {}).setdefault((t, typ), r)
+            _promo_rows_add(name, t, typ, cr, r)
+        else:
+            _index_simple.setdefault(name, {})[key] = r
+
+async def _reindex_after_unknown_append(name: str, ws, keys: List[str]):
+    if name == SHEET4_NAME:
+        try: await ws_index_promo(name, ws)
+        except Exception: pass  # index dropped; the next upsert reads it again
+    else:
+        idx = _index_simple.setdefault(name, {})
+        for k in keys:
+            idx[k] = idx.get(k, -1)
+
+# ---------- Upserts (write-behind + backoff) ----------
+def _upsert_settle(st_bucket: dict, label: str, diffs: List[str], scope: str, on_done=None, fp=None):
+    def settle(status: str, err: Optional[Exception]):
+        if fp and status in ("updated", "inserted"):
+            fp_put(*fp)
+        if status == "updated" and diffs:
+            st_bucket["updated_details"].append(f"{label}: " + "; ".join(diffs))
+        if status == "error":
+            st_bucket["skipped_reasons"][label] = f"upsert error: {err}"
+            print(f"{scope} upsert error:", err, flush=True)
+        if on_done: on_done(status)
+    return settle
+
+async def _submit_row(name: str, ws, values: List[str], settle, row: int = 0, key: str = "") -> str:
+    fut = _write_queue(name).submit(ws, values, settle, row=row, key=key)
+    return await fut
+
+async def _queue_update(name: str, ws, row: int, rowvals: List[str], header: List[str],
+                        st_bucket: dict, label: str, scope: str, on_done=None, key: str = "") -> str:
+    q = _write_queue(name)
+    before = q.pending_update(row)
+    queued = before is not None
+    if before is None:
+        before = _mirror_row(name, row)
+    # No local copy of the row: the same incoming row as last delivered is not worth a read.
+    # With one, the diff below decides, so cells cleared by hand are filled again.
+    if before is None and key and fp_matches(name, key, rowvals):
+        return _settle_now("unchanged", on_done)
+    if before is None:
+        before = await _with_backoff(ws.row_values, row)
+    merged = _merge_preserve_nonempty(before, rowvals) if PRESERVE_EXISTING_NONEMPTY else rowvals
+    diffs = _calc_diffs(header, before, merged)
+    if not diffs and not queued:
+        if key: fp_put(name, key, rowvals)
+        return _settle_now("unchanged", on_done)
+    settle = _upsert_settle(st_bucket, label, diffs, scope, on_done, fp=(name, key, rowvals) if key else None)
+    if on_done:
+        q.submit(ws, merged, settle, row=row)
+        return "queued"
+    return await _submit_row(name, ws, merged, settle, row=row)
+
+async def _queue_insert(name: str, ws, key: str, rowvals: List[str],
+                        st_bucket: dict, label: str, scope: str, on_done=None) -> str:
+    q = _write_queue(name)
+    pending = q.pending_insert(key)
+    if pending is not None and PRESERVE_EXISTING_NONEMPTY:
+        rowvals = _merge_preserve_nonempty(pending, rowvals)
+    settle = _upsert_settle(st_bucket, label, [], scope, on_done, fp=(name, key, rowvals))
+    if on_done:
+        q.submit(ws, rowvals, settle, key=key)
+        return "queued"
+    return await _submit_row(name, ws, rowvals, settle, key=key)
+
+def _settle_now(status: str, on_done=None) -> str:
+    if on_done: on_done(status)
+    return status
+
+async def upsert_welcome(name: str, ws, ticket: str, rowvals: List[str], st_bucket: dict, on_done=None) -> str:
+    """Queue a Sheet1 write. Without on_done, waits for the flush and returns its status;
+    with on_done, returns "queued" and reports the final status through the callback."""
     ticket = _fmt_ticket(ticket)
-    idx = _index_simple.get(name) or ws_index_welcome(name, ws)
     header = HEADERS_SHEET1
     try:
-        # UPDATE path
+        idx = _index_simple[name] if name in _index_simple else await ws_index_welcome(name, ws)
+        # REINDEX if we inserted this ticket earlier and never learned its row, or on a miss
+        # against an index that was not built from a full read of the tab (no mirror)
+        if idx.get(ticket, 0) < 0 or (ticket not in idx and name not in _mirror):
+            idx = await ws_index_welcome(name, ws)
         if ticket in idx and idx[ticket] > 0:
             if INSERT_ONLY:
-                return "skipped-existing"
-            row = idx[ticket]
-            before = _with_backoff(ws.row_values, row)
-            merged = _merge_preserve_nonempty(before, rowvals) if PRESERVE_EXISTING_NONEMPTY else rowvals
-            rng = f"A{row}:{chr(ord('A')+len(merged)-1)}{row}"
-            _sleep_ms(SHEETS_THROTTLE_MS)
-            _with_backoff(ws.batch_update, [{"range": rng, "values": [merged]}])
-            diffs = _calc_diffs(header, before, merged)
-            if diffs:
-                st_bucket["updated_details"].append(f"{ticket}: " + "; ".join(diffs))
-            return "updated"
-
-        # REINDEX then UPDATE if found
-        _sleep_ms(SHEETS_THROTTLE_MS)
-        idx = ws_index_welcome(name, ws)
-        if ticket in idx and idx[ticket] > 0:
-            if INSERT_ONLY:
-                return "skipped-existing"
-            row = idx[ticket]
-            before = _with_backoff(ws.row_values, row)
-            merged = _merge_preserve_nonempty(before, rowvals) if PRESERVE_EXISTING_NONEMPTY else rowvals
-            rng = f"A{row}:{chr(ord('A')+len(merged)-1)}{row}"
-            _sleep_ms(SHEETS_THROTTLE_MS)
-            _with_backoff(ws.batch_update, [{"range": rng, "values": [merged]}])
-            diffs = _calc_diffs(header, before, merged)
-            if diffs:
-                st_bucket["updated_details"].append(f"{ticket}: " + "; ".join(diffs))
-            return "updated"
-
-        # INSERT path
-        _sleep_ms(SHEETS_THROTTLE_MS)
-        _with_backoff(ws.append_row, rowvals, value_input_option="RAW")
-        _index_simple.setdefault(name, {})[ticket] = _index_simple[name].get(ticket, -1)
-        return "inserted"
+                return _settle_now("skipped-existing", on_done)
+            return await _queue_update(name, ws, idx[ticket], rowvals, header, st_bucket, ticket, "Welcome", on_done, key=ticket)
+        # INSERT path — unless an append of this ticket is in flight: once it lands this is an update
+        if await _write_queue(name).insert_settled(ticket):
+            return await upsert_welcome(name, ws, ticket, rowvals, st_bucket, on_done)
+        return await _queue_insert(name, ws, ticket, rowvals, st_bucket, ticket, "Welcome", on_done)
     except Exception as e:
         st_bucket["skipped_reasons"][ticket] = f"upsert error: {e}"
         print("Welcome upsert error:", e, flush=True)
-        return "error"
+        return _settle_now("error", on_done)
 
-def _find_promo_row_pair(ws, ticket: str, typ: str) -> Optional[int]:
-    try:
-        values = ws.get_all_values()
-        if not values: return None
-        header = [h.strip().lower() for h in values[0]]
-        col_ticket  = header.index("ticket number") if "ticket number" in header else 0
-        col_type    = header.index("type") if "type" in header else 4
-        for r_i, row in enumerate(values[1:], start=2):
-            t   = _fmt_ticket(row[col_ticket] if col_ticket < len(row) else "")
-            ty2 = (row[col_type] if col_type < len(row) else "").strip().lower()
-            if t == _fmt_ticket(ticket) and ty2 == (typ or "").strip().lower():
-                return r_i
-    except Exception:
-        pass
-    return None
+def _find_promo_row_pair(name: str, ticket: str, typ: str) -> Optional[int]:
+    pairs = _index_promo_pair.get(name) or {}
+    return pairs.get((_fmt_ticket(ticket), (typ or "").strip().lower()))
 
-def upsert_promo(name: str, ws, ticket: str, typ: str, created_str: str, rowvals: List[str], st_bucket: dict) -> str:
+async def upsert_promo(name: str, ws, ticket: str, typ: str, created_str: str, rowvals: List[str],
+                       st_bucket: dict, on_done=None) -> str:
+    """Sheet4 counterpart of upsert_welcome (same queue/on_done contract)."""
     ticket = _fmt_ticket(ticket)
     key = _key_promo(ticket, typ, created_str)
-    idx = _index_promo.get(name) or ws_index_promo(name, ws)
+    label = f"{ticket}:{typ}:{created_str}"
     header = HEADERS_SHEET4
     try:
+        idx = _index_promo[name] if name in _index_promo else await ws_index_promo(name, ws)
+        # REINDEX on a miss against an index that was not built from a full read of the tab
+        if key not in idx and name not in _mirror:
+            idx = await ws_index_promo(name, ws)
         # UPDATE by exact composite key
         if key in idx:
             if INSERT_ONLY:
-                return "skipped-existing"
-            row = idx[key]
-            before = _with_backoff(ws.row_values, row)
-            merged = _merge_preserve_nonempty(before, rowvals) if PRESERVE_EXISTING_NONEMPTY else rowvals
-            rng = f"A{row}:{chr(ord('A')+len(merged)-1)}{row}"
-            _sleep_ms(SHEETS_THROTTLE_MS)
-            _with_backoff(ws.batch_update, [{"range": rng, "values": [merged]}])
-            diffs = _calc_diffs(header, before, merged)
-            if diffs:
-                st_bucket["updated_details"].append(f"{ticket}:{typ}:{created_str}: " + "; ".join(diffs))
-            return "updated"
+                return _settle_now("skipped-existing", on_done)
+            return await _queue_update(name, ws, idx[key], rowvals, header, st_bucket, label, "Promo", on_done, key=key)
+
+        # Already waiting to be inserted in this flush window
+        if _write_queue(name).pending_insert(key) is not None:
+            return await _queue_insert(name, ws, key, rowvals, st_bucket, label, "Promo", on_done)
+
+        # Being appended right now: re-resolve against the index once the row has landed
+        q = _write_queue(name)
+        if await q.insert_settled(key) or await q.insert_settled((ticket, (typ or "").strip().lower())):
+            return await upsert_promo(name, ws, ticket, typ, created_str, rowvals, st_bucket, on_done)
 
         # UPDATE by (ticket + type) pair if created differs
-        rpair = _find_promo_row_pair(ws, ticket, typ)
+        rpair = _find_promo_row_pair(name, ticket, typ)
         if rpair:
             if INSERT_ONLY:
-                return "skipped-existing"
-            before = _with_backoff(ws.row_values, rpair)
-            merged = _merge_preserve_nonempty(before, rowvals) if PRESERVE_EXISTING_NONEMPTY else rowvals
-            rng = f"A{rpair}:{chr(ord('A')+len(merged)-1)}{rpair}"
-            _sleep_ms(SHEETS_THROTTLE_MS)
-            _with_backoff(ws.batch_update, [{"range": rng, "values": [merged]}])
-            ws_index_promo(name, ws)
-            diffs = _calc_diffs(header, before, merged)
-            if diffs:
-                st_bucket["updated_details"].append(f"{ticket}:{typ}:{created_str}: " + "; ".join(diffs))
-            return "updated"
+                return _settle_now("skipped-existing", on_done)
+            return await _queue_update(name, ws, rpair, rowvals, header, st_bucket, label, "Promo", on_done, key=key)
 
         # INSERT
-        _sleep_ms(SHEETS_THROTTLE_MS)
-        _with_backoff(ws.append_row, rowvals, value_input_option="RAW")
-        ws_index_promo(name, ws)
-        return "inserted"
+        return await _queue_insert(name, ws, key, rowvals, st_bucket, label, "Promo", on_done)
     except Exception as e:
-        st_bucket["skipped_reasons"][f"{ticket}:{typ}:{created_str}"] = f"upsert error: {e}"
+        st_bucket["skipped_reasons"][label] = f"upsert error: {e}"
         print("Promo upsert error:", e, flush=True)
-        return "error"
+        return _settle_now("error", on_done)
 
-def dedupe_sheet(name: str, ws, has_type: bool=False) -> Tuple[int,int]:
-    values = ws.get_all_values()
-    if len(values) <= 1: return (0,0)
+def _dedupe_plan(values: List[List[str]], has_type: bool) -> Tuple[int, List[int]]:
+    """(unique keys kept, sheet rows to delete) — newest 'date closed' wins per key."""
+    if len(values) <= 1: return (0, [])
     rows = values[1:]
     header = [h.strip().lower() for h in values[0]]
 
@@ -573,14 +1362,545 @@ def dedupe_sheet(name: str, ws, has_type: bool=False) -> Tuple[int,int]:
 
     keep_rows = {r for (r,_dt) in winners.values()}
     to_delete = [i for i,_ in enumerate(rows,start=2) if i not in keep_rows]
-    deleted = 0
-    for r in sorted(to_delete, reverse=True):
-        try: ws.delete_rows(r); deleted += 1
-        except Exception: pass
+    return (len(winners), to_delete)
+
+def _row_runs(rows: List[int]) -> List[Tuple[int,int]]:
+    """Collapse row numbers into contiguous (start, end) runs, bottom-up so deletes don't shift later ones."""
+    runs: List[Tuple[int,int]] = []
+    for r in sorted(set(rows), reverse=True):
+        if runs and runs[-1][0] == r + 1:
+            runs[-1] = (r, runs[-1][1])
+        else:
+            runs.append((r, r))
+    return runs
+
+def dedupe_preview(values: List[List[str]], has_type: bool=False) -> Dict[str,int]:
+    """What dedupe_sheet would do with these values, and the Sheets requests it would cost."""
+    kept, to_delete = _dedupe_plan(values, has_type)
+    runs = _row_runs(to_delete)
+    return {"rows": max(0, len(values) - 1), "kept": kept, "dupes": len(to_delete),
+            "ranges": len(runs), "requests": 1 if runs else 0}
+
+def _resolve_row(name: str, values: List[str]) -> Tuple[Optional[int], str]:
+    """(row now holding this row's key, its insert key) from the tab's indexes."""
+    if name == SHEET4_NAME:
+        t, typ, cr = _promo_fields(name, values)
+        key = _key_promo(t, typ, cr)
+        return (_index_promo.get(name, {}).get(key) or _find_promo_row_pair(name, t, typ)), key
+    t = _fmt_ticket(values[0] if values else "")
+    return _index_simple.get(name, {}).get(t), t
+
+async def dedupe_sheet(name: str, ws, has_type: bool=False) -> Tuple[int,int]:
+    """Delete duplicate rows with one batchUpdate of deleteDimension ranges; reindex locally.
+    Read, delete and re-mirror happen with the tab's write-behind queue drained and held, so no
+    flush lands in between; rows still waiting in the queue are moved to their new row numbers."""
+    q = _write_queue(name)
+
+    async def rewrite() -> Tuple[int,int]:
+        values = await _with_backoff(ws.get_all_values)
+        kept, to_delete = _dedupe_plan(values, has_type)
+        runs = _row_runs(to_delete)
+        if runs:
+            reqs = [{"deleteDimension": {"range": {"sheetId": ws.id, "dimension": "ROWS",
+                                                   "startIndex": start - 1, "endIndex": end}}}
+                    for start, end in runs]
+            await _with_backoff(ws.spreadsheet.batch_update, {"requests": reqs})
+            gone = set(to_delete)
+            values = [row for i, row in enumerate(values, start=1) if i not in gone]
+
+        _mirror[name] = values
+        if has_type: _index_promo_values(name, values)
+        else: _index_welcome_values(name, values)
+        if to_delete:
+            q.rebase(to_delete, functools.partial(_resolve_row, name))
+            fp_clear(name)
+        return (kept, len(to_delete))
+
+    return await q.exclusive(rewrite)
+
+# ---------- Ticket storage backends ----------
+TICKET_STORE = os.getenv("TICKET_STORE", "sheets").strip().lower()  # sheets | sqlite | mirror
+MIRROR_SYNC_RETRY_SEC = int(os.getenv("MIRROR_SYNC_RETRY_SEC", "120"))  # mirror mode: retry failed Sheets syncs
+
+class TicketStore(ABC):
+    """Where ticket rows live. Tabs are addressed by name (SHEET1_NAME / SHEET4_NAME);
+    upserts follow the upsert_welcome/upsert_promo status + on_done contract."""
+    kind = "base"
+
+    async def load(self, name: str):
+        """(Re)load lookups for a tab before bulk work (backfill, scheduled refresh)."""
+
+    @abstractmethod
+    async def upsert_welcome(self, ticket: str, rowvals: List[str], st_bucket: dict, on_done=None) -> str:
+        ...
+
+    @abstractmethod
+    async def upsert_promo(self, ticket: str, typ: str, created_str: str, rowvals: List[str],
+                           st_bucket: dict, on_done=None) -> str:
+        ...
+
+    @abstractmethod
+    async def find_welcome(self, ticket: str) -> Optional[List[str]]:
+        ...
+
+    @abstractmethod
+    async def find_promo(self, ticket: str, typ: str, created_str: str) -> Optional[List[str]]:
+        ...
+
+    @abstractmethod
+    async def values(self, name: str) -> List[List[str]]:
+        """Header + every row of a tab (what dedupe plans against)."""
+
+    async def snapshot(self, name: str) -> List[List[str]]:
+        """Header + every row as the store holds them now, in one bulk read and without flushing."""
+        return await self.values(name)
+
+    @abstractmethod
+    async def dedupe(self, name: str, values: Optional[List[List[str]]] = None) -> Tuple[int,int]:
+        ...
+
+    @abstractmethod
+    async def row_counts(self) -> Dict[str,int]:
+        ...
+
+    async def flush(self, *names: str):
+        """Push anything still buffered (all tabs when no names given)."""
+
+def _tab_headers(name: str) -> List[str]:
+    return HEADERS_SHEET4 if name == SHEET4_NAME else HEADERS_SHEET1
+
+class _SheetsStore(TicketStore):
+    """Google Sheets as the store: write-behind queue, row mirror and indexes above."""
+    kind = "sheets"
+
+    async def _ws(self, name: str):
+        return await get_ws(name, _tab_headers(name))
+
+    async def load(self, name: str):
+        ws = await self._ws(name)
+        if name == SHEET4_NAME: await ws_index_promo(name, ws)
+        else: await ws_index_welcome(name, ws)
+
+    async def upsert_welcome(self, ticket, rowvals, st_bucket, on_done=None) -> str:
+        return await upsert_welcome(SHEET1_NAME, await self._ws(SHEET1_NAME), ticket, rowvals, st_bucket, on_done)
+
+    async def upsert_promo(self, ticket, typ, created_str, rowvals, st_bucket, on_done=None) -> str:
+        return await upsert_promo(SHEET4_NAME, await self._ws(SHEET4_NAME), ticket, typ, created_str, rowvals,
+                                  st_bucket, on_done)
+
+    async def _row(self, name: str, row: Optional[int]) -> Optional[List[str]]:
+        if not row or row < 0: return None
+        vals = _mirror_row(name, row)
+        if vals is None:
+            vals = await _with_backoff((await self._ws(name)).row_values, row)
+        return vals
+
+    async def find_welcome(self, ticket):
+        if SHEET1_NAME not in _index_simple: await self.load(SHEET1_NAME)
+        return await self._row(SHEET1_NAME, _index_simple[SHEET1_NAME].get(_fmt_ticket(ticket)))
+
+    async def find_promo(self, ticket, typ, created_str):
+        if SHEET4_NAME not in _index_promo: await self.load(SHEET4_NAME)
+        row = _index_promo[SHEET4_NAME].get(_key_promo(ticket, typ, created_str))
+        return await self._row(SHEET4_NAME, row or _find_promo_row_pair(SHEET4_NAME, ticket, typ))
+
+    async def values(self, name):
+        ws = await self._ws(name)
+        await flush_writes(name)
+        return await _with_backoff(ws.get_all_values)
+
+    async def snapshot(self, name):
+        # Read-only (it backs --plan): a missing tab reads as empty instead of being created
+        ws = await _find_ws(name)
+        return (await _with_backoff(ws.get_all_values) or []) if ws else []
+
+    async def dedupe(self, name, values=None):
+        # values (the preview's read) may be stale by now; dedupe_sheet re-reads under the queue lock
+        return await dedupe_sheet(name, await self._ws(name), name == SHEET4_NAME)
+
+    async def row_counts(self):
+        ws1, ws4 = await asyncio.gather(self._ws(SHEET1_NAME), self._ws(SHEET4_NAME))
+        col1, col4 = await asyncio.gather(_with_backoff(ws1.col_values, 1), _with_backoff(ws4.col_values, 1))
+        return {SHEET1_NAME: max(0, len(col1) - 1), SHEET4_NAME: max(0, len(col4) - 1)}
+
+    async def flush(self, *names):
+        await flush_writes(*names)
+
+_WELCOME_COLS = ("ticket", "username", "clantag", "date_closed")
+_PROMO_COLS   = ("ticket", "username", "clantag", "date_closed", "type", "created")
+
+class _SqliteStore(TicketStore):
+    """Local SQLite tables in the state DB; unique indexes on ticket and (ticket, type, created)."""
+    kind = "sqlite"
+
+    def __init__(self):
+        self._ready = False
+
+    def _db(self) -> sqlite3.Connection:
+        conn = _state_db()
+        if not self._ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS welcome_rows ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, ticket TEXT NOT NULL, username TEXT NOT NULL DEFAULT '',"
+                " clantag TEXT NOT NULL DEFAULT '', date_closed TEXT NOT NULL DEFAULT '')"
+            )
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS welcome_rows_ticket ON welcome_rows(ticket)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS promo_rows ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, ticket TEXT NOT NULL, username TEXT NOT NULL DEFAULT '',"
+                " clantag TEXT NOT NULL DEFAULT '', date_closed TEXT NOT NULL DEFAULT '', type TEXT NOT NULL DEFAULT '',"
+                " created TEXT NOT NULL DEFAULT '', type_key TEXT NOT NULL DEFAULT '')"
+            )
+            # (ticket, type, created) is the composite key; its ticket / (ticket, type) prefixes serve the other lookups
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS promo_rows_key ON promo_rows(ticket, type_key, created)")
+            self._ready = True
+        return conn
+
+    @staticmethod
+    def _pad(rowvals: List[str], cols) -> List[str]:
+        return ([(v or "") for v in rowvals] + [""] * len(cols))[:len(cols)]
+
+    def _write(self, table: str, cols, row_id: Optional[int], values: List[str], extra: Dict[str,str]):
+        names = list(cols) + list(extra)
+        vals = list(values) + list(extra.values())
+        if row_id:
+            sets = ", ".join(f"{c}=?" for c in names)
+            self._db().execute(f"UPDATE {table} SET {sets} WHERE id=?", (*vals, row_id))
+        else:
+            marks = ",".join("?" * len(names))
+            self._db().execute(f"INSERT INTO {table}({','.join(names)}) VALUES ({marks})", vals)
 
-    if has_type: ws_index_promo(name, ws)
-    else: ws_index_welcome(name, ws)
-    return (len(winners), deleted)
+    def _upsert(self, table: str, cols, header: List[str], found, rowvals: List[str], extra: Dict[str,str],
+                st_bucket: dict, label: str, scope: str, on_done=None) -> str:
+        try:
+            incoming = self._pad(rowvals, cols)
+            if found:
+                if INSERT_ONLY:
+                    return _settle_now("skipped-existing", on_done)
+                row_id, before = found[0], list(found[1:])
+                merged = _merge_preserve_nonempty(before, incoming) if PRESERVE_EXISTING_NONEMPTY else incoming
+                diffs = _calc_diffs(header, before, merged)
+                if not diffs:
+                    return _settle_now("unchanged", on_done)
+                self._write(table, cols, row_id, merged, extra)
+                st_bucket["updated_details"].append(f"{label}: " + "; ".join(diffs))
+                return _settle_now("updated", on_done)
+            self._write(table, cols, None, incoming, extra)
+            return _settle_now("inserted", on_done)
+        except Exception as e:
+            st_bucket["skipped_reasons"][label] = f"upsert error: {e}"
+            print(f"{scope} upsert error:", e, flush=True)
+            return _settle_now("error", on_done)
+
+    def _find_welcome(self, ticket: str):
+        return self._db().execute(
+            f"SELECT id, {','.join(_WELCOME_COLS)} FROM welcome_rows WHERE ticket=?", (_fmt_ticket(ticket),)
+        ).fetchone()
+
+    def _find_promo(self, ticket: str, typ: str, created_str: str):
+        t, tk = _fmt_ticket(ticket), (typ or "").strip().lower()
+        cols = f"id, {','.join(_PROMO_COLS)}"
+        db = self._db()
+        return (db.execute(f"SELECT {cols} FROM promo_rows WHERE ticket=? AND type_key=? AND created=?",
+                           (t, tk, (created_str or "").strip())).fetchone()
+                or db.execute(f"SELECT {cols} FROM promo_rows WHERE ticket=? AND type_key=? ORDER BY id LIMIT 1",
+                              (t, tk)).fetchone())
+
+    async def upsert_welcome(self, ticket, rowvals, st_bucket, on_done=None) -> str:
+        ticket = _fmt_ticket(ticket)
+        return self._upsert("welcome_rows", _WELCOME_COLS, HEADERS_SHEET1, self._find_welcome(ticket), rowvals, {},
+                            st_bucket, ticket, "Welcome", on_done)
+
+    async def upsert_promo(self, ticket, typ, created_str, rowvals, st_bucket, on_done=None) -> str:
+        ticket = _fmt_ticket(ticket)
+        label = f"{ticket}:{typ}:{created_str}"
+        extra = {"type_key": (typ or "").strip().lower()}
+        return self._upsert("promo_rows", _PROMO_COLS, HEADERS_SHEET4, self._find_promo(ticket, typ, created_str),
+                            rowvals, extra, st_bucket, label, "Promo", on_done)
+
+    async def find_welcome(self, ticket):
+        found = self._find_welcome(ticket)
+        return list(found[1:]) if found else None
+
+    async def find_promo(self, ticket, typ, created_str):
+        found = self._find_promo(ticket, typ, created_str)
+        return list(found[1:]) if found else None
+
+    async def values(self, name):
+        table, cols = ("promo_rows", _PROMO_COLS) if name == SHEET4_NAME else ("welcome_rows", _WELCOME_COLS)
+        rows = self._db().execute(f"SELECT {','.join(cols)} FROM {table} ORDER BY id").fetchall()
+        return [list(_tab_headers(name))] + [list(r) for r in rows]
+
+    async def dedupe(self, name, values=None):
+        # Unique indexes keep duplicates out, so there is never anything to delete
+        values = values if values is not None else await self.values(name)
+        return max(0, len(values) - 1), 0
+
+    async def row_counts(self):
+        db = self._db()
+        return {SHEET1_NAME: db.execute("SELECT COUNT(*) FROM welcome_rows").fetchone()[0],
+                SHEET4_NAME: db.execute("SELECT COUNT(*) FROM promo_rows").fetchone()[0]}
+
+    def is_empty(self, name: str) -> bool:
+        table = "promo_rows" if name == SHEET4_NAME else "welcome_rows"
+        return self._db().execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+
+    def import_values(self, name: str, values: List[List[str]]) -> int:
+        """Seed a table from sheet values (header first); later rows win, like the sheet indexes."""
+        n = 0
+        db = self._db()
+        db.execute("BEGIN")
+        try:
+            for row in values[1:]:
+                if name == SHEET4_NAME:
+                    t, typ, cr = _promo_fields(name, row)
+                    if not t: continue
+                    vals = self._pad(row, _PROMO_COLS); vals[0] = t
+                    db.execute(f"INSERT OR REPLACE INTO promo_rows({','.join(_PROMO_COLS)}, type_key) VALUES (?,?,?,?,?,?,?)",
+                               (*vals, typ))
+                else:
+                    t = _fmt_ticket(row[0] if row else "")
+                    if not t: continue
+                    vals = self._pad(row, _WELCOME_COLS); vals[0] = t
+                    db.execute(f"INSERT OR REPLACE INTO welcome_rows({','.join(_WELCOME_COLS)}) VALUES (?,?,?,?)", vals)
+                n += 1
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return n
+
+class _MirrorStore(TicketStore):
+    """SQLite is the system of record (written synchronously); Sheets is a downstream view synced
+    through a persisted outbox, so a Sheets outage or restart never loses a row."""
+    kind = "mirror"
+
+    def __init__(self, local: _SqliteStore, remote: _SheetsStore):
+        self.local, self.remote = local, remote
+        self._inflight: Dict[Tuple[str,str], asyncio.Task] = {}
+        self._retry: Optional[asyncio.Task] = None
+
+    def _db(self) -> sqlite3.Connection:
+        conn = self.local._db()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sheets_outbox ("
+            " tab TEXT NOT NULL, key TEXT NOT NULL, ticket TEXT NOT NULL, typ TEXT NOT NULL DEFAULT '',"
+            " created TEXT NOT NULL DEFAULT '', row TEXT NOT NULL, PRIMARY KEY (tab, key))"
+        )
+        return conn
+
+    async def load(self, name):
+        await self.remote.load(name)
+        if self.local.is_empty(name) and _mirror.get(name):
+            n = self.local.import_values(name, _mirror[name])
+            print(f"[store] seeded {n} {name} row(s) from Sheets", flush=True)
+
+    def _enqueue(self, name: str, key: str, ticket: str, row: List[str], typ: str = "", created: str = ""):
+        self._db().execute(
+            "INSERT OR REPLACE INTO sheets_outbox(tab, key, ticket, typ, created, row) VALUES (?,?,?,?,?,?)",
+            (name, key, ticket, typ, created, json.dumps(row)),
+        )
+        self._push(name, key)
+
+    def _push(self, name: str, key: str):
+        task = self._inflight.get((name, key))
+        if task is None or task.done():
+            self._inflight[(name, key)] = asyncio.get_running_loop().create_task(self._sync(name, key))
+
+    async def _sync(self, name: str, key: str):
+        while True:
+            got = self._db().execute("SELECT ticket, typ, created, row FROM sheets_outbox WHERE tab=? AND key=?",
+                                     (name, key)).fetchone()
+            if not got: return
+            ticket, typ, created, raw = got
+            row = json.loads(raw)
+            try:
+                if name == SHEET4_NAME:
+                    status = await self.remote.upsert_promo(ticket, typ, created, row, _new_bucket())
+                else:
+                    status = await self.remote.upsert_welcome(ticket, row, _new_bucket())
+            except Exception as e:
+                print(f"[store] Sheets sync failed for {name}/{key}: {type(e).__name__}: {e}", flush=True)
+                status = "error"
+            if status == "error":
+                self._retry_later(); return
+            # A newer row queued for this key meanwhile stays in the outbox and goes next loop
+            self._db().execute("DELETE FROM sheets_outbox WHERE tab=? AND key=? AND row=?", (name, key, raw))
+
+    def _retry_later(self):
+        if self._retry is None or self._retry.done():
+            self._retry = asyncio.get_running_loop().create_task(self._retry_loop())
+
+    async def _retry_loop(self):
+        while True:
+            await asyncio.sleep(MIRROR_SYNC_RETRY_SEC)
+            await self.flush()
+            if not self.outbox_count(): return
+
+    def outbox_count(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM sheets_outbox").fetchone()[0]
+
+    async def upsert_welcome(self, ticket, rowvals, st_bucket, on_done=None) -> str:
+        status = await self.local.upsert_welcome(ticket, rowvals, st_bucket, on_done)
+        if status in ("inserted", "updated"):
+            row = await self.local.find_welcome(ticket)
+            self._enqueue(SHEET1_NAME, _fmt_ticket(ticket), _fmt_ticket(ticket), row)
+        return status
+
+    async def upsert_promo(self, ticket, typ, created_str, rowvals, st_bucket, on_done=None) -> str:
+        status = await self.local.upsert_promo(ticket, typ, created_str, rowvals, st_bucket, on_done)
+        if status in ("inserted", "updated"):
+            row = await self.local.find_promo(ticket, typ, created_str)
+            self._enqueue(SHEET4_NAME, _key_promo(ticket, typ, created_str), _fmt_ticket(ticket), row, typ, created_str)
+        return status
+
+    async def find_welcome(self, ticket):
+        return await self.local.find_welcome(ticket)
+
+    async def find_promo(self, ticket, typ, created_str):
+        return await self.local.find_promo(ticket, typ, created_str)
+
+    # Dedupe is about the sheet view; the SQLite side cannot hold duplicates
+    async def values(self, name):
+        return await self.remote.values(name)
+
+    async def snapshot(self, name):
+        return await self.local.snapshot(name)
+
+    async def dedupe(self, name, values=None):
+        return await self.remote.dedupe(name, values)
+
+    async def row_counts(self):
+        return await self.local.row_counts()
+
+    async def flush(self, *names):
+        for name, key in self._db().execute("SELECT tab, key FROM sheets_outbox").fetchall():
+            if not names or name in names:
+                self._push(name, key)
+        pending = [t for (name, _k), t in self._inflight.items() if not t.done() and (not names or name in names)]
+        if pending: await asyncio.gather(*pending, return_exceptions=True)
+        self._inflight = {k: t for k, t in self._inflight.items() if not t.done()}
+        await self.remote.flush(*names)
+
+_ticket_store: Optional[TicketStore] = None
+
+def ticket_store() -> TicketStore:
+    """The configured store (TICKET_STORE=sheets|sqlite|mirror); everything that reads or writes tickets goes through it."""
+    global _ticket_store
+    if _ticket_store is None:
+        if TICKET_STORE == "sqlite":
+            _ticket_store = _SqliteStore()
+        elif TICKET_STORE == "mirror":
+            _ticket_store = _MirrorStore(_SqliteStore(), _SheetsStore())
+        else:
+            if TICKET_STORE != "sheets":
+                print(f"[store] unknown TICKET_STORE={TICKET_STORE!r}; using sheets", flush=True)
+            _ticket_store = _SheetsStore()
+    return _ticket_store
+
+class _PlanStore(TicketStore):
+    """Dry run (`--plan`): upserts are decided against one in-memory snapshot per tab of the real
+    store and never sent. Statuses and diffs are the ones the real store would report."""
+    kind = "plan"
+
+    def __init__(self, base: TicketStore):
+        self.base = base
+        self.rows: Dict[str, List[List[str]]] = {}
+        self.index: Dict[str, Dict[Any, int]] = {}
+        self.ops: Dict[str, Dict[str, int]] = {}
+        self.reads = 0
+
+    async def load(self, name):
+        if name in self.rows: return
+        values = await self.base.snapshot(name); self.reads += 1
+        self.rows[name] = [list(r) for r in values] or [list(_tab_headers(name))]
+        self._reindex(name)
+        self.ops[name] = {"inserts": 0, "updates": 0, "deletes": 0}
+
+    def _reindex(self, name: str):
+        self.index[name] = {}
+        for i, row in enumerate(self.rows[name][1:], start=1):
+            self._index(name, i, row)
+
+    def _index(self, name: str, i: int, row: List[str]):
+        idx = self.index[name]
+        if name == SHEET4_NAME:
+            t, typ, cr = _promo_fields(name, row)
+            if t: idx[_key_promo(t, typ, cr)] = i; idx.setdefault((t, typ), i)
+        else:
+            t = _fmt_ticket(row[0] if row else "")
+            if t: idx[t] = i
+
+    def _plan(self, name: str, i: Optional[int], rowvals: List[str], st_bucket: dict, label: str, on_done) -> str:
+        if i is not None:
+            if INSERT_ONLY:
+                return _settle_now("skipped-existing", on_done)
+            before = self.rows[name][i]
+            merged = _merge_preserve_nonempty(before, rowvals) if PRESERVE_EXISTING_NONEMPTY else rowvals
+            diffs = _calc_diffs(_tab_headers(name), before, merged)
+            if not diffs:
+                return _settle_now("unchanged", on_done)
+            self.rows[name][i] = merged; self._index(name, i, merged)
+            self.ops[name]["updates"] += 1
+            st_bucket["updated_details"].append(f"{label}: " + "; ".join(diffs))
+            return _settle_now("updated", on_done)
+        self.rows[name].append(list(rowvals)); self._index(name, len(self.rows[name]) - 1, rowvals)
+        self.ops[name]["inserts"] += 1
+        return _settle_now("inserted", on_done)
+
+    async def upsert_welcome(self, ticket, rowvals, st_bucket, on_done=None) -> str:
+        await self.load(SHEET1_NAME)
+        t = _fmt_ticket(ticket)
+        return self._plan(SHEET1_NAME, self.index[SHEET1_NAME].get(t), rowvals, st_bucket, t, on_done)
+
+    async def upsert_promo(self, ticket, typ, created_str, rowvals, st_bucket, on_done=None) -> str:
+        await self.load(SHEET4_NAME)
+        t = _fmt_ticket(ticket); key = _key_promo(t, typ, created_str)
+        idx = self.index[SHEET4_NAME]
+        i = idx.get(key, idx.get((t, (typ or "").strip().lower())))
+        return self._plan(SHEET4_NAME, i, rowvals, st_bucket, f"{t}:{typ}:{created_str}", on_done)
+
+    async def find_welcome(self, ticket):
+        await self.load(SHEET1_NAME)
+        i = self.index[SHEET1_NAME].get(_fmt_ticket(ticket))
+        return list(self.rows[SHEET1_NAME][i]) if i is not None else None
+
+    async def find_promo(self, ticket, typ, created_str):
+        await self.load(SHEET4_NAME)
+        t = _fmt_ticket(ticket); idx = self.index[SHEET4_NAME]
+        i = idx.get(_key_promo(t, typ, created_str), idx.get((t, (typ or "").strip().lower())))
+        return list(self.rows[SHEET4_NAME][i]) if i is not None else None
+
+    async def values(self, name):
+        await self.load(name)
+        return [list(r) for r in self.rows[name]]
+
+    async def dedupe(self, name, values=None):
+        """Plans the duplicate deletes on the snapshot (values are ignored: the plan is the source)."""
+        await self.load(name)
+        kept, to_delete = _dedupe_plan(self.rows[name], name == SHEET4_NAME)
+        gone = set(to_delete)
+        self.rows[name] = [row for i, row in enumerate(self.rows[name], start=1) if i not in gone]
+        self._reindex(name)
+        self.ops[name]["deletes"] += len(to_delete)
+        return (kept, len(to_delete))
+
+    async def row_counts(self):
+        return {name: max(0, len(rows) - 1) for name, rows in self.rows.items()}
+
+    def cost(self) -> Dict[str, Any]:
+        """Sheets requests the real run would make: the snapshot reads, then per tab one batch_update
+        for updates plus one append for inserts per write-behind flush. Best case is every row of a
+        tab landing in full SHEETS_FLUSH_MAX_ROWS batches; worst case is one flush per row. Planned
+        dedupes add one batchUpdate per tab."""
+        if self.base.kind == "sqlite":
+            return {"reads": 0, "writes_min": 0, "writes_max": 0, "minutes": 0.0}
+        per = max(1, SHEETS_FLUSH_MAX_ROWS)
+        dedupes = sum(1 for o in self.ops.values() if o["deletes"])
+        lo = dedupes + sum(-(-o["updates"] // per) + -(-o["inserts"] // per) for o in self.ops.values())
+        hi = dedupes + sum(o["updates"] + o["inserts"] for o in self.ops.values())
+        return {"reads": self.reads, "writes_min": lo, "writes_max": hi,
+                "minutes": round(max(self.reads / max(1, SHEETS_READS_PER_MIN), hi / max(1, SHEETS_WRITES_PER_MIN)), 1)}
 
 # ---------- Close marker detection (forgiving) ----------
 CLOSE_RX = re.compile(r'(?i)\b(ticket)?\s*closed\b[\s:\-–—•]*\bby\b')
@@ -588,7 +1908,8 @@ CLOSE_RX = re.compile(r'(?i)\b(ticket)?\s*closed\b[\s:\-–—•]*\bby\b')
 def is_close_marker(text: str) -> bool:
     if not text:
         return False
-    return bool(CLOSE_RX.search(text))
+    # Substring prefilter: far cheaper than the regex, and almost no message says "closed"
+    return "closed" in text.lower() and bool(CLOSE_RX.search(text))
 
 # ---------- Parsing + inference ----------
 WELCOME_START_RX = re.compile(r'(?i)^(?:closed[- ]*)?(\d{4})[- ]+(.+)$')
@@ -616,23 +1937,23 @@ def _aggregate_msg_text(msg: discord.Message) -> str:
 async def infer_clantag_from_thread(thread: discord.Thread) -> Optional[str]:
     if not ENABLE_INFER_TAG_FROM_THREAD:
         return None
-    try: await thread.join()
-    except Exception: pass
-    try:
-        async for msg in thread.history(limit=500, oldest_first=False):
-            text = _aggregate_msg_text(msg)
-            tag = _match_tag_in_text(text)
-            if tag:
-                return tag
-    except discord.Forbidden:
-        return None
-    except Exception:
-        return None
-    return None
+    return (await analyze_thread_history(thread, want_close=False, want_tag=True)).tag
+
+PARSE_CACHE_MAX = int(os.getenv("PARSE_CACHE_MAX", "4096"))  # thread names kept per parser (LRU)
 
 def parse_welcome_thread_name_allow_missing(name: str) -> Optional[Tuple[str,str,Optional[str]]]:
     if not name:
         return None
+    _clan_tags()  # lapsed TTL -> background reload; a changed list bumps the generation
+    return _parse_welcome_cached(name, _clan_tags_gen)
+
+def parse_promo_thread_name(name: str) -> Optional[Tuple[str,str,str]]:
+    if not name: return None
+    _clan_tags()
+    return _parse_promo_cached(name, _clan_tags_gen)
+
+@functools.lru_cache(maxsize=PARSE_CACHE_MAX)
+def _parse_welcome_cached(name: str, _gen: int) -> Optional[Tuple[str,str,Optional[str]]]:
     s = _normalize_dashes(name).strip()
 
     m = WELCOME_START_RX.match(s)
@@ -646,7 +1967,7 @@ def parse_welcome_thread_name_allow_missing(name: str) -> Optional[Tuple[str,str
         ticket = _fmt_ticket(m.group(1))
         remainder = m.group(2)
 
-    picked = _pick_tag_by_suffix(remainder, _load_clan_tags())
+    picked = _pick_tag_by_suffix(remainder, _clan_tags())
     if picked:
         username, tag = picked
         return (ticket, _clean_username(username), tag)
@@ -659,30 +1980,178 @@ def parse_welcome_thread_name_allow_missing(name: str) -> Optional[Tuple[str,str
 
     return (ticket, _clean_username(remainder), None)
 
-def parse_promo_thread_name(name: str) -> Optional[Tuple[str,str,str]]:
-    if not name: return None
+@functools.lru_cache(maxsize=PARSE_CACHE_MAX)
+def _parse_promo_cached(name: str, _gen: int) -> Optional[Tuple[str,str,str]]:
     m = PROMO_START_RX.match((name or "").strip())
     if not m: return None
     ticket = _fmt_ticket(m.group(1))
     remainder = m.group(2)
-    picked = _pick_tag_by_suffix(remainder, _load_clan_tags())
+    picked = _pick_tag_by_suffix(remainder, _clan_tags())
     if picked:
         username, tag = picked
         return (ticket, _clean_username(username), tag)
     return (ticket, _clean_username(remainder), "")
 
 async def find_close_timestamp(thread: discord.Thread) -> Optional[datetime]:
+    return (await analyze_thread_history(thread, want_close=True)).close_dt
+
+# ---------- Thread history analyzer ----------
+HISTORY_LIMIT       = 500  # newest messages walked per thread
+HISTORY_INTRO_LIMIT = 100  # oldest messages checked for the promo intro when a thread is longer than that
+
+class ThreadSignals:
+    """What one history walk found (None = not found or not asked for)."""
+    __slots__ = ("close_dt", "promo_type", "tag", "scanned")
+    def __init__(self):
+        self.close_dt: Optional[datetime] = None
+        self.promo_type: Optional[str] = None
+        self.tag: Optional[str] = None
+        self.scanned = 0
+
+def _match_promo_type(text: str) -> Optional[str]:
+    for rx, typ in PROMO_TYPE_PATTERNS:
+        if rx.search(text):
+            return typ
+    return None
+
+async def analyze_thread_history(thread: discord.Thread, want_close: bool = True,
+                                 want_type: bool = False, want_tag: bool = False) -> ThreadSignals:
+    """Close marker, promo type and newest clan tag from one newest-first history walk that stops as
+    soon as every requested signal is found. The promo intro sits at the oldest end, so for long threads
+    (by message_count, or when the walk hits HISTORY_LIMIT) it is read from there in one short page."""
+    sig = ThreadSignals()
+    want_tag = want_tag and ENABLE_INFER_TAG_FROM_THREAD
+    if not (want_close or want_type or want_tag):
+        return sig
     try: await thread.join()
     except Exception: pass
+
+    async def intro_type():
+        async for msg in thread.history(limit=HISTORY_INTRO_LIMIT, oldest_first=True):
+            typ = _match_promo_type(_aggregate_msg_text(msg))
+            if typ: return typ
+        return None
+
     try:
-        async for msg in thread.history(limit=500, oldest_first=False):
+        # Known-long thread: one page from the oldest end beats paging all the way back for the intro
+        intro_first = want_type and (getattr(thread, "message_count", None) or 0) > 100
+        if intro_first:
+            sig.promo_type = await intro_type()
+        async for msg in thread.history(limit=HISTORY_LIMIT, oldest_first=False):
+            sig.scanned += 1
             text = _aggregate_msg_text(msg)
-            if is_close_marker(text):
-                return msg.created_at
+            if want_close and sig.close_dt is None and is_close_marker(text):
+                sig.close_dt = msg.created_at
+            if want_type and sig.promo_type is None:
+                sig.promo_type = _match_promo_type(text)
+            if want_tag and sig.tag is None:
+                sig.tag = _match_tag_in_text(text)
+            if ((not want_close or sig.close_dt) and (not want_type or sig.promo_type)
+                    and (not want_tag or sig.tag)):
+                break
+        if want_type and sig.promo_type is None and not intro_first and sig.scanned >= HISTORY_LIMIT:
+            sig.promo_type = await intro_type()
     except discord.Forbidden: pass
     except Exception: pass
-    return None
-    
+    return sig
+
+# ---------- Live thread digests ----------
+THREAD_DIGEST_MAX     = int(os.getenv("THREAD_DIGEST_MAX", "2000"))        # threads tracked (LRU)
+THREAD_DIGEST_TTL_SEC = int(os.getenv("THREAD_DIGEST_TTL_SEC", "1209600"))  # drop digests idle this long (14d)
+
+class _ThreadDigest:
+    """Signals seen live in one watched thread (newest wins). A signal that is still None only means
+    we have not seen it: messages sent before the join landed, or during a reconnect, never reach us."""
+    __slots__ = ("close_dt", "promo_type", "tag", "touched")
+    def __init__(self):
+        self.close_dt: Optional[datetime] = None
+        self.promo_type: Optional[str] = None
+        self.tag: Optional[str] = None
+        self.touched = time.time()
+
+_digests: "OrderedDict[int, _ThreadDigest]" = OrderedDict()
+
+def _digest_get(thread_id: int) -> Optional[_ThreadDigest]:
+    d = _digests.get(thread_id)
+    if d is None: return None
+    if time.time() - d.touched > THREAD_DIGEST_TTL_SEC:
+        _digests.pop(thread_id, None)
+        return None
+    _digests.move_to_end(thread_id)
+    return d
+
+def _digest_for(thread_id: int) -> _ThreadDigest:
+    d = _digest_get(thread_id)
+    if d is None:
+        d = _digests[thread_id] = _ThreadDigest()
+        while len(_digests) > THREAD_DIGEST_MAX:
+            _digests.popitem(last=False)
+    d.touched = time.time()
+    return d
+
+class MessageScan:
+    """Text work for one message in a watched thread, each piece done lazily and at most once."""
+    __slots__ = ("message", "_text", "_closed", "_tag")
+
+    def __init__(self, message: discord.Message):
+        self.message = message
+        self._text: Optional[str] = None
+        self._closed: Optional[bool] = None
+        self._tag: Any = False  # False = not computed yet (None is a valid answer)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            m = self.message
+            self._text = _aggregate_msg_text(m) if (m.content or m.embeds) else ""
+        return self._text
+
+    @property
+    def closed(self) -> bool:
+        if self._closed is None:
+            self._closed = is_close_marker(self.text)
+        return self._closed
+
+    @property
+    def tag(self) -> Optional[str]:
+        if self._tag is False:
+            self._tag = _match_tag_in_text(self.text) if self.text else None
+        return self._tag
+
+def digest_note_message(thread: discord.Thread, scan: MessageScan):
+    """Fold one live message into its thread's digest."""
+    if not scan.text: return  # attachments/stickers only
+    d = _digest_for(thread.id)
+    if scan.closed:
+        d.close_dt = scan.message.created_at
+    # The intro names the promo type; once known, later messages are not pattern-matched
+    if d.promo_type is None and thread.parent_id == PROMO_CHANNEL_ID:
+        d.promo_type = _match_promo_type(scan.text)
+    if scan.tag: d.tag = scan.tag
+
+async def thread_signals(thread: discord.Thread, want_close: bool = True,
+                         want_type: bool = False, want_tag: bool = False) -> ThreadSignals:
+    """Like analyze_thread_history, but answered from the live digest when it can be; history is
+    only walked for wanted signals the digest has not seen."""
+    want_tag = want_tag and ENABLE_INFER_TAG_FROM_THREAD
+    d = _digest_get(thread.id)
+    if d is None:
+        return await analyze_thread_history(thread, want_close, want_type, want_tag)
+    sig = ThreadSignals()
+    sig.close_dt = d.close_dt if want_close else None
+    sig.promo_type = d.promo_type if want_type else None
+    sig.tag = d.tag if want_tag else None
+    need_close = want_close and sig.close_dt is None
+    need_type = want_type and sig.promo_type is None
+    need_tag = want_tag and sig.tag is None
+    if need_close or need_type or need_tag:
+        got = await analyze_thread_history(thread, need_close, need_type, need_tag)
+        sig.close_dt = sig.close_dt or got.close_dt
+        sig.promo_type = sig.promo_type or got.promo_type
+        sig.tag = sig.tag or got.tag
+        sig.scanned = got.scanned
+    return sig
+
 # ---- keepalive / watchdog state ----
 _LAST_READY_TS: float = 0.0
 
@@ -841,7 +2310,7 @@ def _who_to_ping(msg: discord.Message, thread: discord.Thread) -> Optional[disco
 # ---------- Tag prompt (dropdown + fallback) ----------
 async def _prompt_for_tag(thread: discord.Thread, ticket: str, username: str,
                           msg_to_reply: Optional[discord.Message], mode: str):
-    tags = await _run_blocking(_load_clan_tags, False) or []
+    tags = await _load_clan_tags(False) or []
     closer = _who_to_ping(msg_to_reply, thread)
     mention = f"{closer.mention} " if closer else ""
     content = (
@@ -872,6 +2341,98 @@ async def _prompt_for_tag(thread: discord.Thread, ticket: str, username: str,
         f"{prefix}Need clan tag for **{username}** (ticket **{_fmt_ticket(ticket)}**) → {thread_link(thread)}"
     )
 
+# ---------- Local journal (SQLite write-ahead) ----------
+JOURNAL_REPLAY_BATCH = int(os.getenv("JOURNAL_REPLAY_BATCH", "100"))  # rows per replay flush
+JOURNAL_RETRY_SEC    = int(os.getenv("JOURNAL_RETRY_SEC", "120"))     # wait before replaying again after errors
+JOURNAL_KEEP_DAYS    = int(os.getenv("JOURNAL_KEEP_DAYS", "14"))      # committed entries older than this are pruned
+
+def journal_record(tab: str, ticket: str, row: List[str], typ: str = "", created: str = "") -> Optional[int]:
+    """Persist a finalized row before it is sent to Sheets; returns the entry id (None if the DB is unusable)."""
+    try:
+        cur = _state_db().execute(
+            "INSERT INTO journal(tab, ticket, typ, created, row, ts) VALUES (?,?,?,?,?,?)",
+            (tab, _fmt_ticket(ticket), typ or "", created or "", json.dumps(row), time.time()),
+        )
+        return cur.lastrowid
+    except Exception as e:
+        print(f"[journal] record failed: {type(e).__name__}: {e}", flush=True)
+        return None
+
+def journal_commit(*ids: Optional[int]):
+    ids = [i for i in ids if i]
+    if not ids: return
+    try:
+        _state_db().executemany("UPDATE journal SET committed=1 WHERE id=?", [(i,) for i in ids])
+    except Exception as e:
+        print(f"[journal] commit failed: {type(e).__name__}: {e}", flush=True)
+
+def journal_pending(limit: int = 0) -> List[Tuple[int, str, str, str, str, List[str]]]:
+    sql = "SELECT id, tab, ticket, typ, created, row FROM journal WHERE committed=0 ORDER BY id"
+    rows = _state_db().execute(sql + (f" LIMIT {int(limit)}" if limit else "")).fetchall()
+    return [(i, tab, t, typ, c, json.loads(r)) for i, tab, t, typ, c, r in rows]
+
+def journal_pending_count() -> int:
+    try:
+        return _state_db().execute("SELECT COUNT(*) FROM journal WHERE committed=0").fetchone()[0]
+    except Exception:
+        return -1
+
+def _journal_prune():
+    cutoff = time.time() - JOURNAL_KEEP_DAYS * 86400
+    _state_db().execute("DELETE FROM journal WHERE committed=1 AND ts < ?", (cutoff,))
+
+async def _replay_journal_batch(entries) -> int:
+    """Re-run upserts for one batch of uncommitted entries; returns how many still failed."""
+    done: Dict[int, str] = {}
+    bucket = _new_bucket()
+    store = ticket_store()
+    tabs = set()
+    for jid, tab, ticket, typ, created, row in entries:
+        cb = lambda status, jid=jid: done.__setitem__(jid, status)
+        if tab == SHEET4_NAME:
+            await store.upsert_promo(ticket, typ, created, row, bucket, on_done=cb)
+        else:
+            await store.upsert_welcome(ticket, row, bucket, on_done=cb)
+        tabs.add(tab)
+    await store.flush(*tabs)
+    journal_commit(*[jid for jid, status in done.items() if status != "error"])
+    return sum(1 for jid, *_ in entries if done.get(jid, "error") == "error")
+
+async def replay_journal() -> int:
+    """Replay uncommitted journal entries (oldest first) until none are left or Sheets fails; returns rows replayed."""
+    replayed = 0
+    while True:
+        entries = journal_pending(JOURNAL_REPLAY_BATCH)
+        if not entries: break
+        try:
+            failed = await _replay_journal_batch(entries)
+        except Exception as e:
+            print(f"[journal] replay failed: {type(e).__name__}: {e}", flush=True)
+            failed = len(entries)
+        replayed += len(entries) - failed
+        if failed: break
+    return replayed
+
+_journal_task: Optional[asyncio.Task] = None
+
+async def _journal_replay_loop():
+    try:
+        _journal_prune()
+    except Exception as e:
+        print(f"[journal] prune failed: {type(e).__name__}: {e}", flush=True)
+    while journal_pending_count() > 0:
+        n = await replay_journal()
+        left = journal_pending_count()
+        print(f"[journal] replayed {n} row(s); {left} still pending", flush=True)
+        if left <= 0: break
+        await asyncio.sleep(JOURNAL_RETRY_SEC)
+
+def _kick_journal_replay():
+    """Start the replay loop unless it is already running (boot, and after a failed live write)."""
+    global _journal_task
+    if _journal_task is None or _journal_task.done():
+        _journal_task = asyncio.get_running_loop().create_task(_journal_replay_loop())
+
 # ---------- Finalizers (log + rename) ----------
 async def _rename_welcome_thread_if_needed(thread: discord.Thread, ticket: str, username: str, clantag: str) -> bool:
     try:
@@ -892,149 +2453,489 @@ async def _rename_welcome_thread_if_needed(thread: discord.Thread, ticket: str,
         pass
     return False
 
+async def _journaled_upsert(tab: str, ticket: str, row: List[str], typ: str = "", created: str = "") -> str:
+    """Journal the row, then write it; failed writes stay in the journal and are replayed later."""
+    jid = journal_record(tab, ticket, row, typ, created)
+    dummy_bucket = _new_bucket()
+    store = ticket_store()
+    try:
+        if tab == SHEET4_NAME:
+            status = await store.upsert_promo(ticket, typ, created, row, dummy_bucket)
+        else:
+            status = await store.upsert_welcome(ticket, row, dummy_bucket)
+    except Exception as e:
+        print(f"[journal] {tab} write deferred for {_fmt_ticket(ticket)}: {type(e).__name__}: {e}", flush=True)
+        status = "error"
+    if status == "error": _kick_journal_replay()
+    else: journal_commit(jid)
+    return status
+
 async def _finalize_welcome(thread: discord.Thread, ticket: str, username: str, clantag: str, close_dt: Optional[datetime]):
-    ws = await _run_blocking(get_ws, SHEET1_NAME, HEADERS_SHEET1)
     renamed = await _rename_welcome_thread_if_needed(thread, ticket, username, clantag or "")
     if renamed:
         log_action("welcome", "renamed", ticket=_fmt_ticket(ticket), username=username, clantag=clantag or "", link=thread_link(thread))
     date_str = fmt_tz(close_dt) if close_dt else ""
     row = [_fmt_ticket(ticket), username, clantag or "", date_str]
-    dummy_bucket = _new_bucket()
-    status = await _run_blocking(upsert_welcome, SHEET1_NAME, ws, ticket, row, dummy_bucket)
+    status = await _journaled_upsert(SHEET1_NAME, ticket, row)
     log_action("welcome", "logged", ticket=_fmt_ticket(ticket), username=username, clantag=clantag or "", status=status, link=thread_link(thread))
 
 async def _finalize_promo(thread: discord.Thread, ticket: str, username: str, clantag: str, close_dt: Optional[datetime]):
-    ws = await _run_blocking(get_ws, SHEET4_NAME, HEADERS_SHEET4)
     renamed = await _rename_welcome_thread_if_needed(thread, ticket, username, clantag or "")
     if renamed:
         log_action("promo", "renamed",
                    ticket=_fmt_ticket(ticket), username=username,
                    clantag=clantag or "", link=thread_link(thread))
 
-    typ = await detect_promo_type(thread) or ""
+    typ = (await thread_signals(thread, want_close=False, want_type=True)).promo_type or ""
     created_str = fmt_tz(thread.created_at)
     date_str = fmt_tz(close_dt) if close_dt else ""
     row = [_fmt_ticket(ticket), username, clantag or "", date_str, typ, created_str]
-    dummy_bucket = _new_bucket()
-    status = await _run_blocking(upsert_promo, SHEET4_NAME, ws, ticket, typ, created_str, row, dummy_bucket)
+    status = await _journaled_upsert(SHEET4_NAME, ticket, row, typ, created_str)
     log_action("promo", "logged",
                ticket=_fmt_ticket(ticket), username=username,
                clantag=clantag or "", status=status, link=thread_link(thread))
 
 # ---------- Scans (backfill) ----------
-def _new_report_bucket(): return _new_bucket()
+# Incremental backfill: a thread whose (name, archive time, last message) is unchanged since it was
+# last synced is not re-analyzed unless the run is --full.
+_thread_fps: Optional[Dict[int, str]] = None
+
+def _thread_fp(th: discord.Thread, tagged: bool = True) -> str:
+    """A thread synced without a clan tag also carries the tag list's hash: once the clanlist
+    changes the tag may be known, so the thread is analyzed again."""
+    arch = getattr(th, "archive_timestamp", None)
+    fp = f"{th.name or ''}|{arch.isoformat() if arch else ''}|{getattr(th, 'last_message_id', None) or ''}"
+    return fp if tagged else f"{fp}|tags:{_clan_tags_hash}"
+
+def _thread_fp_table() -> Dict[int, str]:
+    global _thread_fps
+    if _thread_fps is None:
+        try:
+            _thread_fps = dict(_state_db().execute("SELECT thread_id, fp FROM thread_fingerprints").fetchall())
+        except Exception as e:
+            print(f"[backfill] thread fingerprints unavailable: {type(e).__name__}: {e}", flush=True)
+            _thread_fps = {}
+    return _thread_fps
 
-async def scan_welcome_channel(channel: discord.TextChannel, progress_cb=None):
-    st = backfill_state["welcome"] = _new_report_bucket()
-    if not ENABLE_WELCOME_SCAN:
-        backfill_state["last_msg"] = "welcome scan disabled"; return
-    ws = await _run_blocking(get_ws, SHEET1_NAME, HEADERS_SHEET1)
-    await _run_blocking(ws_index_welcome, SHEET1_NAME, ws)
+def thread_unchanged(th: discord.Thread) -> bool:
+    fp = _thread_fp_table().get(th.id)
+    return fp is not None and fp in (_thread_fp(th), _thread_fp(th, tagged=False))
+
+def thread_synced(th: discord.Thread, scope: str, tagged: bool = True):
+    fp = _thread_fp(th, tagged)
+    _thread_fp_table()[th.id] = fp
+    try:
+        _state_db().execute(
+            "INSERT INTO thread_fingerprints(thread_id, scope, fp, ts) VALUES (?,?,?,?)"
+            " ON CONFLICT(thread_id) DO UPDATE SET fp=excluded.fp, ts=excluded.ts",
+            (th.id, scope, fp, time.time()),
+        )
+    except Exception as e:
+        print(f"[backfill] thread fingerprint save failed: {type(e).__name__}: {e}", flush=True)
+
+def _thread_done(st: dict, key: str, th: discord.Thread, scope: str, then=None, tagged: bool = True):
+    """on_done for a backfill upsert: tally it, and remember the thread as synced unless the write failed."""
+    def done(status: str):
+        _tally(st, key, status)
+        if status != "error" and not backfill_state["plan"]:
+            thread_synced(th, scope, tagged)
+        if then: then()
+    return done
+
+def _row_first() -> bool:
+    """Existing cells survive the upsert (merge or insert-only), so the row can stand in for history."""
+    return PRESERVE_EXISTING_NONEMPTY or INSERT_ONLY
+
+def _padded(row: Optional[List[str]], n: int) -> Optional[List[str]]:
+    return (list(row) + [""] * n)[:n] if row else None
+
+async def _existing_promo_row(store: TicketStore, ticket: str, created_str: str) -> Optional[List[str]]:
+    """The Sheet4 row for exactly this thread (ticket + created), whatever type it was logged under."""
+    for typ in [t for _, t in PROMO_TYPE_PATTERNS] + [""]:
+        row = _padded(await store.find_promo(ticket, typ, created_str), 6)
+        if row and row[5].strip() == created_str and row[4].strip().lower() == typ:
+            return row
+    return None
+
+def _tally(st: dict, key: str, status: str):
+    """Record a settled upsert status (called when the write-behind flush lands)."""
+    if status == "inserted":
+        st["added"] += 1; st["added_ids"].append(key)
+    elif status == "updated":
+        st["updated"] += 1; st["updated_ids"].append(key)
+    elif status == "unchanged":
+        st["unchanged"] += 1
+    else:
+        st["skipped"] += 1; st["skipped_ids"].append(key); st["skipped_reasons"].setdefault(key, "unknown")
 
-    async def handle(th: discord.Thread):
-        if not backfill_state["running"]: return
-        await _handle_welcome_thread(th, ws, st)
-        if progress_cb: await progress_cb()
+# Backfill worker pool: threads from both channels go through one queue and up to BACKFILL_WORKERS
+# handlers run at once. The live limit backs off (AIMD) on Discord 429s, slow threads, an open
+# Sheets circuit or a starved write budget, and creeps back up while things stay fast.
+BACKFILL_WORKERS = max(1, int(os.getenv("BACKFILL_WORKERS", "4")))
+BACKFILL_SLOW_SEC = float(os.getenv("BACKFILL_SLOW_SEC", "8"))  # a thread taking longer than this halves the limit
+BACKFILL_RL_COOLDOWN_SEC = 30  # hold the limit down this long after Discord reports a 429
+
+class _DiscordRateLimitWatch(logging.Handler):
+    """Counts discord.py's 'being rate limited' warnings (it parses the 429 headers and sleeps for us)."""
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.last = 0.0
+        self.hits = 0
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            if "rate limit" in record.getMessage().lower():
+                self.last = time.monotonic(); self.hits += 1
+        except Exception:
+            pass
 
+    def recent(self) -> bool:
+        return self.hits > 0 and time.monotonic() - self.last < BACKFILL_RL_COOLDOWN_SEC
+
+_discord_rl = _DiscordRateLimitWatch()
+logging.getLogger("discord.http").addHandler(_discord_rl)
+
+def _sheets_write_starved() -> bool:
+    w = _sheets_budget.snapshot()["write"]
+    return w["paused_s"] > 0 or (w["available"] == 0 and w["waiting"] > 0)
+
+class _AdaptiveLimit:
+    """Concurrency gate for backfill workers: halve on pressure, +1 per fast thread, up to `hi`."""
+    def __init__(self, hi: int):
+        self.hi = max(1, hi)
+        self.limit = self.hi
+        self.active = 0
+        self._cond = asyncio.Condition()
+
+    def allowed(self) -> int:
+        return 1 if _sheets_breaker.is_open else self.limit
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < self.allowed())
+            self.active += 1
+
+    async def release(self, elapsed: float):
+        async with self._cond:
+            self.active -= 1
+            if elapsed > BACKFILL_SLOW_SEC or _discord_rl.recent() or _sheets_write_starved():
+                self.limit = max(1, self.limit // 2)
+            elif self.limit < self.hi:
+                self.limit += 1
+            self._cond.notify_all()
+
+class _StageStats:
+    """Items through one backfill pipeline stage, and the rate since the run started."""
+    def __init__(self):
+        self.count = 0
+        self.t0 = time.monotonic()
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.t0
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def render(self) -> str:
+        return f"{self.count} ({self.rate():.1f}/s)"
+
+_backfill_pipe: Optional[Dict[str, Any]] = None  # live pipeline of the running backfill (for status)
+
+async def _channel_threads(channel: discord.TextChannel, scope: str, cursors: Dict[str, str]):
+    """(stream, thread): active threads (stream None), then public and private archived ones, newest
+    archive first and resuming below a checkpoint cursor; missing access is noted in last_msg."""
     try:
-        for th in channel.threads:
-            if not backfill_state["running"]: break
-            await handle(th)
+        for th in list(channel.threads):
+            yield None, th
     except Exception: pass
-    try:
-        async for th in channel.archived_threads(limit=None, private=False):
-            if not backfill_state["running"]: break
-            await handle(th)
-    except discord.Forbidden:
-        backfill_state["last_msg"] += " | no access to public archived welcome threads"
-    try:
-        async for th in channel.archived_threads(limit=None, private=True):
+    for private in (False, True):
+        stream = f"{scope}:{'private' if private else 'public'}"
+        before = datetime.fromisoformat(cursors[stream]) if cursors.get(stream) else None
+        try:
+            async for th in channel.archived_threads(limit=None, private=private, before=before):
+                yield stream, th
+        except discord.Forbidden:
+            _run_state()["last_msg"] += f" | no access to {'private' if private else 'public'} archived {scope} threads"
+
+# ---------- Backfill checkpoints ----------
+# Every finished thread's own report bucket is saved under the run id, so a resumed run rebuilds the
+# counters and details exactly and skips those threads. Each archive listing also keeps a low-water
+# cursor (every thread archived after it is finished) so a resume does not page through them again.
+def _fold_report(scope: str, bucket: dict):
+    """Add one thread's bucket to the channel report; its diffs and skip reasons go to the spill files."""
+    rep = _run_state()[scope]
+    for k, v in bucket.items():
+        if isinstance(v, int): rep[k] += v
+    for k in ("added_ids", "updated_ids", "skipped_ids"):
+        room = BACKFILL_SAMPLE_MAX - len(rep[k])
+        if room > 0: rep[k].extend(bucket[k][:room])
+    spill = _run_spill()
+    for line in bucket["updated_details"]:
+        spill.write(scope, "updated", line)
+    for key, reason in bucket["skipped_reasons"].items():
+        spill.write(scope, "skipped", f"{key} -> {reason}")
+
+class BackfillRun:
+    """Checkpoint of one backfill run (state DB tables backfill_runs / backfill_done)."""
+    def __init__(self, run_id: int, full: bool, cursors: Optional[Dict[str, str]] = None):
+        self.id = run_id
+        self.full = full
+        self.cursors: Dict[str, str] = dict(cursors or {})
+        self.done: set = set()
+        self._streams: Dict[str, OrderedDict] = {}
+        self._stream_of: Dict[int, str] = {}
+
+    @classmethod
+    def start(cls, full: bool) -> "BackfillRun":
+        db = _state_db(); now = time.time()
+        # A new run supersedes older checkpoints
+        db.execute("DELETE FROM backfill_done")
+        db.execute("DELETE FROM backfill_runs")
+        cur = db.execute("INSERT INTO backfill_runs(started, full, status, updated) VALUES (?,?,?,?)",
+                         (now, int(full), "running", now))
+        return cls(cur.lastrowid, full)
+
+    @classmethod
+    def resumable(cls) -> Optional["BackfillRun"]:
+        """Latest run that was stopped or never finished (crash, restart)."""
+        row = _state_db().execute(
+            "SELECT id, full, cursors FROM backfill_runs WHERE status != 'done' ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        return cls(row[0], bool(row[1]), json.loads(row[2] or "{}")) if row else None
+
+    def restore(self) -> int:
+        """Fold finished threads back into the run's report buckets; returns how many."""
+        rows = _state_db().execute("SELECT thread_id, scope, bucket FROM backfill_done WHERE run_id=?", (self.id,))
+        for tid, scope, bucket in rows:
+            self.done.add(tid)
+            _fold_report(scope, json.loads(bucket))
+        return len(self.done)
+
+    def listed(self, stream: Optional[str], th: discord.Thread):
+        if not stream: return
+        arch = getattr(th, "archive_timestamp", None)
+        self._streams.setdefault(stream, OrderedDict())[th.id] = [arch.isoformat() if arch else "", False]
+        self._stream_of[th.id] = stream
+
+    def finished(self, scope: str, th: discord.Thread, bucket: dict):
+        self.done.add(th.id)
+        db = _state_db()
+        try:
+            db.execute("INSERT OR REPLACE INTO backfill_done(run_id, thread_id, scope, bucket) VALUES (?,?,?,?)",
+                       (self.id, th.id, scope, json.dumps(bucket)))
+            stream = self._stream_of.pop(th.id, None)
+            if stream:
+                pending = self._streams[stream]
+                pending[th.id][1] = True
+                moved = False
+                while pending and next(iter(pending.values()))[1]:
+                    _, (arch, _) = pending.popitem(last=False)
+                    if arch: self.cursors[stream] = arch; moved = True
+                if moved:
+                    db.execute("UPDATE backfill_runs SET cursors=?, updated=? WHERE id=?",
+                               (json.dumps(self.cursors), time.time(), self.id))
+        except Exception as e:
+            print(f"[backfill] checkpoint failed: {type(e).__name__}: {e}", flush=True)
+
+    def close(self, status: str):
+        try:
+            _state_db().execute("UPDATE backfill_runs SET status=?, updated=? WHERE id=?", (status, time.time(), self.id))
+        except Exception as e:
+            print(f"[backfill] checkpoint close failed: {type(e).__name__}: {e}", flush=True)
+
+class _DryRunCheckpoint(BackfillRun):
+    """--plan runs keep their progress in memory only."""
+    def __init__(self, full: bool):
+        super().__init__(0, full)
+
+    def restore(self) -> int:
+        return 0
+
+    def finished(self, scope: str, th: discord.Thread, bucket: dict):
+        self.done.add(th.id)
+
+    def close(self, status: str):
+        pass
+
+async def run_backfill(run: BackfillRun, progress_cb=None, store: Optional[TicketStore] = None):
+    """Scan both channels as a pipeline: thread listing -> bounded queue -> history analyzers
+    (adaptive pool) -> bounded queue -> writer feeding the store (the write-behind queue batches).
+    Each thread reports into its own bucket, folded into the run's report and checkpointed when done."""
+    global _backfill_pipe
+    store = store or ticket_store()
+    state = _run_state()
+    state["welcome"] = _new_report_bucket(); state["promo"] = _new_report_bucket()
+    _run_spill().reset()
+    resumed = run.restore()
+    if resumed:
+        state["last_msg"] += f" | resumed run #{run.id} ({resumed} threads already done)"
+    sources = []  # (scope, channel, analyzer, tab)
+    for scope, enabled, cid, analyzer, tab in (
+        ("welcome", ENABLE_WELCOME_SCAN, WELCOME_CHANNEL_ID, _analyze_welcome_thread, SHEET1_NAME),
+        ("promo", ENABLE_PROMO_SCAN, PROMO_CHANNEL_ID, _analyze_promo_thread, SHEET4_NAME),
+    ):
+        if not enabled:
+            state["last_msg"] += f" | {scope} scan disabled"; continue
+        ch = bot.get_channel(cid) if cid else None
+        if isinstance(ch, discord.TextChannel):
+            try:
+                await store.load(tab)
+            except Exception as e:  # upserts read the tab again themselves
+                print(f"[backfill] {tab} index load failed: {type(e).__name__}: {e}", flush=True)
+            sources.append((scope, ch, analyzer, tab))
+    if not sources:
+        run.close("done")
+        return
+
+    threads: asyncio.Queue = asyncio.Queue(maxsize=BACKFILL_WORKERS * 4)
+    writes: asyncio.Queue = asyncio.Queue(maxsize=SHEETS_FLUSH_MAX_ROWS)
+    limit = _AdaptiveLimit(BACKFILL_WORKERS)
+    listed, analyzed, written = _StageStats(), _StageStats(), _StageStats()
+    archive: Dict[str, list] = {}  # stream -> [newest, current, channel created]
+    _backfill_pipe = {"threads": threads, "writes": writes, "limit": limit, "archive": archive,
+                      "listed": listed, "analyzed": analyzed, "written": written, "listing": True,
+                      "writes_granted": _sheets_budget.buckets["write"].granted}
+
+    def finisher(scope: str, th: discord.Thread, bucket: dict):
+        done = []
+        def finish():
+            if done: return
+            done.append(True)
+            _fold_report(scope, bucket)
+            run.finished(scope, th, bucket)
+        return finish
+
+    def failed(bucket: dict, scope: str, key: str, e: BaseException):
+        bucket["skipped"] += 1; bucket["skipped_ids"].append(key); bucket["skipped_reasons"][key] = f"{type(e).__name__}: {e}"[:200]
+        print(f"[backfill] {scope} {key} failed: {type(e).__name__}: {e}", flush=True)
+
+    async def produce(scope, channel, analyzer):
+        async for stream, th in _channel_threads(channel, scope, run.cursors):
             if not backfill_state["running"]: break
-            await handle(th)
-    except discord.Forbidden:
-        backfill_state["last_msg"] += " | no access to private archived welcome threads"
+            arch = getattr(th, "archive_timestamp", None)
+            if stream and arch:
+                pos = archive.setdefault(stream, [arch, arch, channel.created_at])
+                pos[1] = min(pos[1], arch)
+            if th.id in run.done: continue
+            run.listed(stream, th)
+            await threads.put((scope, analyzer, th))
+            listed.count += 1
+
+    async def analyze():
+        while True:
+            item = await threads.get()
+            if item is None: return
+            scope, analyzer, th = item
+            if not backfill_state["running"]: continue
+            await limit.acquire()
+            if not backfill_state["running"]:
+                await limit.release(0.0); continue
+            bucket = _new_bucket()
+            finish = finisher(scope, th, bucket)
+            t0 = time.monotonic(); job = None
+            try:
+                job = await analyzer(th, store, bucket, finish)
+            except Exception as e:
+                failed(bucket, scope, f"thread:{th.id}", e)
+            finally:
+                await limit.release(time.monotonic() - t0)
+            analyzed.count += 1
+            if job: await writes.put((scope, th, bucket, finish, job))
+            else: finish()
+            if progress_cb: progress_cb()
+
+    async def write():
+        # Stopping a run still lands rows that were already analyzed
+        while True:
+            item = await writes.get()
+            if item is None: return
+            scope, th, bucket, finish, job = item
+            try:
+                await job()
+            except Exception as e:
+                failed(bucket, scope, f"thread:{th.id}", e); finish()
+            written.count += 1
 
-async def _handle_welcome_thread(th: discord.Thread, ws, st):
-    if not backfill_state["running"]: return
+    writer = asyncio.create_task(write())
+    analyzers = [asyncio.create_task(analyze()) for _ in range(BACKFILL_WORKERS)]
+    try:
+        await asyncio.gather(*(produce(scope, ch, analyzer) for scope, ch, analyzer, _ in sources))
+        _backfill_pipe["listing"] = False
+    finally:
+        for _ in analyzers: await threads.put(None)
+        await asyncio.gather(*analyzers, return_exceptions=True)
+        completed = backfill_state["running"]
+        await writes.put(None)
+        await asyncio.gather(writer, return_exceptions=True)
+        _backfill_pipe = None
+    await store.flush(*(tab for *_, tab in sources))
+    # Anything not finished (stop) stays out of the checkpoint and is redone by !backfill_resume
+    run.close("done" if completed else "stopped")
+    if progress_cb: progress_cb()
+
+async def _analyze_welcome_thread(th: discord.Thread, store: TicketStore, st, finish=None):
+    """Backfill analyzer stage: returns the row write to run, or None when there is nothing to write."""
     st["scanned"] += 1
+    if not _run_state()["full"] and thread_unchanged(th):
+        st["cached"] += 1
+        return
     parsed = parse_welcome_thread_name_allow_missing(th.name or "")
     if not parsed:
         key = f"name:{th.name}"
         st["skipped"] += 1; st["skipped_ids"].append(key); st["skipped_reasons"][key] = "name parse fail"
         return
     ticket, username, clantag = parsed
-    if not clantag:
-        inferred = await infer_clantag_from_thread(th)
-        clantag = inferred or ""
-    dt = await find_close_timestamp(th)
-    if REQUIRE_CLOSE_MARKER_WELCOME and not dt:
-        date_str = ""
+    # Row first: history is only read for fields the existing row is missing
+    have = _padded(await store.find_welcome(ticket), 4) if _row_first() else None
+    need_close = not (have and have[3].strip())
+    need_tag = not clantag and not (have and have[2].strip())
+    if have is not None and INSERT_ONLY:
+        need_close = need_tag = False
+    date_str = ""
+    if need_close or need_tag:
+        sig = await thread_signals(th, want_close=need_close, want_tag=need_tag)
+        clantag = clantag or sig.tag or ""
+        dt = sig.close_dt
+        if not (REQUIRE_CLOSE_MARKER_WELCOME and not dt):
+            date_str = fmt_tz(dt) if dt else ""
     else:
-        date_str = fmt_tz(dt) if dt else ""
-    row = [ticket, username, clantag, date_str]
-    status = await _run_blocking(upsert_welcome, SHEET1_NAME, ws, ticket, row, st)
-    if status == "inserted":
-        st["added"] += 1; st["added_ids"].append(ticket)
-    elif status == "updated":
-        st["updated"] += 1; st["updated_ids"].append(ticket)
-    else:
-        st["skipped"] += 1; st["skipped_ids"].append(ticket); st["skipped_reasons"].setdefault(ticket, "unknown")
-
-async def scan_promo_channel(channel: discord.TextChannel, progress_cb=None):
-    st = backfill_state["promo"] = _new_report_bucket()
-    if not ENABLE_PROMO_SCAN:
-        backfill_state["last_msg"] = "promo scan disabled"; return
-    ws = await _run_blocking(get_ws, SHEET4_NAME, HEADERS_SHEET4)
-    await _run_blocking(ws_index_promo, SHEET4_NAME, ws)
-
-    async def handle(th: discord.Thread):
-        if not backfill_state["running"]: return
-        await _handle_promo_thread(th, ws, st)
-        if progress_cb: await progress_cb()
-
-    try:
-        for th in channel.threads:
-            if not backfill_state["running"]: break
-            await handle(th)
-    except Exception: pass
-    try:
-        async for th in channel.archived_threads(limit=None, private=False):
-            if not backfill_state["running"]: break
-            await handle(th)
-    except discord.Forbidden:
-        backfill_state["last_msg"] += " | no access to public archived promo threads"
-    try:
-        async for th in channel.archived_threads(limit=None, private=True):
-            if not backfill_state["running"]: break
-            await handle(th)
-    except discord.Forbidden:
-        backfill_state["last_msg"] += " | no access to private archived promo threads"
-
-async def _handle_promo_thread(th: discord.Thread, ws, st):
-    if not backfill_state["running"]: return
+        st["history_skipped"] += 1
+    # A tagless name keeps the row's tag: the store never overwrites a cell with ""
+    row = [ticket, username, clantag or "", date_str]
+    tagged = bool(row[2] or (have and have[2].strip()))
+    return functools.partial(store.upsert_welcome, ticket, row, st,
+                             on_done=_thread_done(st, ticket, th, "welcome", finish, tagged))
+
+async def _analyze_promo_thread(th: discord.Thread, store: TicketStore, st, finish=None):
     st["scanned"] += 1
+    if not _run_state()["full"] and thread_unchanged(th):
+        st["cached"] += 1
+        return
     parsed = parse_promo_thread_name(th.name or "")
     if not parsed:
         key = f"name:{th.name}"
         st["skipped"] += 1; st["skipped_ids"].append(key); st["skipped_reasons"][key] = "name parse fail"
         return
     ticket, username, clantag = parsed
-    typ = await detect_promo_type(th) or ""
-    dt_close = await find_close_timestamp(th)
-    if REQUIRE_CLOSE_MARKER_PROMO and not dt_close:
-        date_str = ""
-    else:
-        date_str = fmt_tz(dt_close) if dt_close else ""
     created_str = fmt_tz(th.created_at)
+    have = await _existing_promo_row(store, ticket, created_str) if _row_first() else None
+    typ = have[4].strip() if have else ""
+    need_close = not (have and have[3].strip())
+    need_type = not typ
+    if have is not None and INSERT_ONLY:
+        need_close = need_type = False
+    date_str = ""
+    if need_close or need_type:
+        sig = await thread_signals(th, want_close=need_close, want_type=need_type)
+        typ = typ or sig.promo_type or ""
+        dt_close = sig.close_dt
+        if not (REQUIRE_CLOSE_MARKER_PROMO and not dt_close):
+            date_str = fmt_tz(dt_close) if dt_close else ""
+    else:
+        st["history_skipped"] += 1
     row = [ticket, username, clantag, date_str, typ, created_str]
-    status = await _run_blocking(upsert_promo, SHEET4_NAME, ws, ticket, typ, created_str, row, st)
     key = f"{ticket}:{typ or 'unknown'}:{created_str}"
-    if status == "inserted":
-        st["added"] += 1; st["added_ids"].append(key)
-    elif status == "updated":
-        st["updated"] += 1; st["updated_ids"].append(key)
-    else:
-        st["skipped"] += 1; st["skipped_ids"].append(key); st["skipped_reasons"].setdefault(key, "unknown")
+    tagged = bool(clantag or (have and have[2].strip()))
+    return functools.partial(store.upsert_promo, ticket, typ, created_str, row, st,
+                             on_done=_thread_done(st, key, th, "promo", finish, tagged))
 
 # ---------- Promo type detection ----------
 PROMO_TYPE_PATTERNS = [
@@ -1043,29 +2944,84 @@ PROMO_TYPE_PATTERNS = [
     (re.compile(r"(?i)we['’]ve received your request to help one of your clan members find a new home"), "clan lead move request"),
 ]
 async def detect_promo_type(thread: discord.Thread) -> Optional[str]:
-    try: await thread.join()
-    except Exception: pass
-    try:
-        async for msg in thread.history(limit=500, oldest_first=False):
-            text = _aggregate_msg_text(msg)
-            for rx, typ in PROMO_TYPE_PATTERNS:
-                if rx.search(text):
-                    return typ
-    except discord.Forbidden: pass
-    except Exception: pass
-    return None
+    return (await analyze_thread_history(thread, want_close=False, want_type=True)).promo_type
 
 # ---------- Auto-post helper for details ----------
-def _build_backfill_details_text() -> str:
-    w = backfill_state["welcome"]; p = backfill_state["promo"]
-    def section(title, lines):
-        return [title] + (lines if lines else ["(none)"]) + [""]
-    lines: List[str] = []
-    lines += section("WELCOME — UPDATED (with diffs):", w["updated_details"])
-    lines += section("WELCOME — SKIPPED (id -> reason):", [f"{k} -> {v}" for k,v in w["skipped_reasons"].items()])
-    lines += section("PROMO — UPDATED (with diffs):", p["updated_details"])
-    lines += section("PROMO — SKIPPED (id -> reason):", [f"{k} -> {v}" for k,v in p["skipped_reasons"].items()])
-    return "\n".join(lines) or "(empty)"
+DISCORD_UPLOAD_LIMIT = int(os.getenv("DISCORD_UPLOAD_LIMIT", str(8 * 1024 * 1024)))  # bytes, when the guild's is unknown
+
+class _DetailSpill:
+    """Backfill details streamed to temp files (one per report section) while the scan runs."""
+    SECTIONS = (("welcome", "updated", "WELCOME — UPDATED (with diffs):"),
+                ("welcome", "skipped", "WELCOME — SKIPPED (id -> reason):"),
+                ("promo", "updated", "PROMO — UPDATED (with diffs):"),
+                ("promo", "skipped", "PROMO — SKIPPED (id -> reason):"))
+
+    def __init__(self):
+        self.dir: Optional[str] = None
+        self._files: Dict[Tuple[str, str], Any] = {}
+
+    def reset(self):
+        self.close()
+        self.dir = tempfile.mkdtemp(prefix="welcomecrew_backfill_")
+
+    def close(self):
+        for f in self._files.values(): f.close()
+        self._files = {}
+        if self.dir:
+            shutil.rmtree(self.dir, ignore_errors=True)
+            self.dir = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def write(self, scope: str, section: str, line: str):
+        if not self.dir: self.reset()
+        f = self._files.get((scope, section))
+        if f is None:
+            f = self._files[(scope, section)] = open(self._path(f"{scope}_{section}.txt"), "a", encoding="utf-8")
+        f.write(line.replace("\n", " ") + "\n")
+
+    def flush(self):
+        if not self.dir: self.reset()
+        for f in self._files.values(): f.flush()
+
+    def export(self, limit: int) -> str:
+        """Assemble the details file on disk, gzipped when it is larger than `limit` bytes; returns its path."""
+        path = self._path("backfill_details.txt")
+        with open(path, "w", encoding="utf-8") as out:
+            for scope, section, title in self.SECTIONS:
+                out.write(title + "\n")
+                src = self._path(f"{scope}_{section}.txt")
+                if os.path.exists(src) and os.path.getsize(src):
+                    with open(src, encoding="utf-8") as f: shutil.copyfileobj(f, out)
+                else:
+                    out.write("(none)\n")
+                out.write("\n")
+        if os.path.getsize(path) <= limit:
+            return path
+        with open(path, "rb") as f, gzip.open(path + ".gz", "wb") as out:
+            shutil.copyfileobj(f, out)
+        os.remove(path)
+        return path + ".gz"
+
+_details_spill = _DetailSpill()
+_plan_spill = _DetailSpill()  # --plan runs keep their own, so a dry run never wipes the last real run's details
+
+def _run_spill() -> _DetailSpill:
+    return _plan_spill if backfill_state["plan"] else _details_spill
+
+async def _send_backfill_details(send, guild: Optional[discord.Guild], spill: Optional[_DetailSpill] = None):
+    """Upload the details file straight from disk through `send` (ctx.send / ctx.reply)."""
+    limit = getattr(guild, "filesize_limit", 0) or DISCORD_UPLOAD_LIMIT
+    spill = spill or _details_spill
+    spill.flush()
+    path = await _run_blocking(spill.export, limit)
+    size = os.path.getsize(path)
+    if size > limit:
+        return await send(f"Backfill details are {size / 1e6:.1f} MB even gzipped; over the {limit / 1e6:.0f} MB upload limit.")
+    ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    prefix = "backfill_plan" if spill is _plan_spill else "backfill_details"
+    await send(file=discord.File(path, filename=f"{prefix}_{ts}.txt" + (".gz" if path.endswith(".gz") else "")))
 
 # ---------- Commands ----------
 def cmd_enabled(flag: bool):
@@ -1139,6 +3095,7 @@ async def cmd_env_check(ctx):
     lines.append(f"• {ok(True)} NOTIFY_PING_ROLE_ID = {notify_role or '(off)'}")
     lines.append(f"• {ok(True)} TIMEZONE = {tz}")
     lines.append(f"• {ok(clan_col >= 1)} CLANLIST_TAG_COLUMN = {clan_col} (1=A, 2=B, …)")
+    lines.append(f"• {ok(TICKET_STORE in ('sheets', 'sqlite', 'mirror'))} TICKET_STORE = {TICKET_STORE}")
 
     lines.append("")
     lines.append("Toggles:")
@@ -1174,8 +3131,8 @@ async def cmd_sheetstatus(ctx):
     email = service_account_email() or "(no service account)"
     try:
         ws1, ws4 = await asyncio.gather(
-            _run_blocking(get_ws, SHEET1_NAME, HEADERS_SHEET1),
-            _run_blocking(get_ws, SHEET4_NAME, HEADERS_SHEET4),
+            get_ws(SHEET1_NAME, HEADERS_SHEET1),
+            get_ws(SHEET4_NAME, HEADERS_SHEET4),
         )
         title = ws1.spreadsheet.title
         await ctx.reply(
@@ -1185,90 +3142,163 @@ async def cmd_sheetstatus(ctx):
     except Exception as e:
         await ctx.reply(f"⚠️ Cannot open sheet: `{e}`\nShare with: `{email}`", mention_author=False)
 
+BACKFILL_PROGRESS_SEC = float(os.getenv("BACKFILL_PROGRESS_SEC", "5"))  # min seconds between progress edits
+
+class _ProgressReporter:
+    """One progress message per backfill: poke() marks it stale, and it is edited at most once per interval."""
+    def __init__(self, msg: discord.Message, interval: float):
+        self.msg = msg
+        self.interval = max(1.0, interval)
+        self._stale = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    def poke(self):
+        self._stale.set()
+
+    async def _loop(self):
+        while True:
+            await self._stale.wait()
+            self._stale.clear()
+            try: await self.msg.edit(content=_render_status())
+            except Exception: pass
+            await asyncio.sleep(self.interval)
+
+    async def close(self, suffix: str = ""):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        try: await self.msg.edit(content=_render_status() + suffix)
+        except Exception: pass
+
+def _backfill_eta(pipe: Dict[str, Any]) -> Optional[float]:
+    """Seconds left. While archives are still being listed, progress is the share of each listing's
+    time span (newest archived thread back to channel creation) already covered, and the slowest
+    listing sets the pace. Afterwards it is the queued threads over the analyzer rate."""
+    elapsed = time.monotonic() - pipe["listed"].t0
+    if pipe["listing"]:
+        fracs = []
+        for newest, current, floor in pipe["archive"].values():
+            span = (newest - floor).total_seconds() if floor else 0
+            if span > 0: fracs.append(min(1.0, max(0.0, (newest - current).total_seconds() / span)))
+        frac = min(fracs) if fracs else 0.0
+        return elapsed * (1 - frac) / frac if frac > 0.01 else None
+    rate = pipe["analyzed"].rate()
+    left = pipe["listed"].count - pipe["analyzed"].count
+    return left / rate if rate > 0 else None
+
+def _fmt_secs(sec: float) -> str:
+    sec = int(sec)
+    if sec >= 3600: return f"{sec // 3600}h{sec % 3600 // 60:02d}m"
+    if sec >= 60: return f"{sec // 60}m{sec % 60:02d}s"
+    return f"{sec}s"
+
+def _render_pipeline(pipe: Dict[str, Any]) -> str:
+    th, wr, lim = pipe["threads"], pipe["writes"], pipe["limit"]
+    elapsed = max(1e-6, time.monotonic() - pipe["listed"].t0)
+    writes = (_sheets_budget.buckets["write"].granted - pipe["writes_granted"]) / elapsed
+    archive = ", ".join(f"{k} {v[1]:%Y-%m-%d}" for k, v in sorted(pipe["archive"].items())) or "—"
+    eta = _backfill_eta(pipe)
+    return (f"\nPipeline — listed {pipe['listed'].render()} → queue {th.qsize()}/{th.maxsize}"
+            f" → analyzed {pipe['analyzed'].render()} (workers {lim.active}/{lim.allowed()} of {lim.hi})"
+            f" → queue {wr.qsize()}/{wr.maxsize} → written {pipe['written'].render()}"
+            f"\nThreads {pipe['analyzed'].rate():.1f}/s, Sheets writes {writes:.2f}/s | archive at: {archive}"
+            f" | elapsed {_fmt_secs(elapsed)}, ETA {('~' + _fmt_secs(eta)) if eta is not None else '?'}")
+
 def _render_status() -> str:
-    st = backfill_state; w = st["welcome"]; p = st["promo"]
+    st = _run_state(); w = st["welcome"]; p = st["promo"]
     return (
-        f"Running: **{st['running']}** | Last: {st.get('last_msg','')}\n"
-        f"Welcome — scanned: **{w['scanned']}**, added: **{w['added']}**, updated: **{w['updated']}**, skipped: **{w['skipped']}**\n"
-        f"Promo   — scanned: **{p['scanned']}**, added: **{p['added']}**, updated: **{p['updated']}**, skipped: **{p['skipped']}**"
+        f"Running: **{backfill_state['running']}** ({'full' if st['full'] else 'incremental'}{', plan only' if backfill_state['plan'] else ''}) | Last: {st.get('last_msg','')}\n"
+        f"Welcome — scanned: **{w['scanned']}** (up to date: {w['cached']}, no history needed: {w['history_skipped']}), added: **{w['added']}**, updated: **{w['updated']}**, unchanged: **{w['unchanged']}**, skipped: **{w['skipped']}**\n"
+        f"Promo   — scanned: **{p['scanned']}** (up to date: {p['cached']}, no history needed: {p['history_skipped']}), added: **{p['added']}**, updated: **{p['updated']}**, unchanged: **{p['unchanged']}**, skipped: **{p['skipped']}**"
+        + (_render_pipeline(_backfill_pipe) if _backfill_pipe else "")
     )
 
+def _render_plan(plan: _PlanStore) -> str:
+    c = plan.cost()
+    lines = [f"**Backfill plan** ({'full' if backfill_plan_state['full'] else 'incremental'}; nothing was written)"]
+    for title, name in (("Welcome", SHEET1_NAME), ("Promo", SHEET4_NAME)):
+        if name in plan.ops:
+            o = plan.ops[name]; st = backfill_plan_state["welcome" if name == SHEET1_NAME else "promo"]
+            lines.append(f"{title} — insert **{o['inserts']}**, update **{o['updates']}**, unchanged {st['unchanged']}, "
+                         f"skipped {st['skipped']}, up to date {st['cached']}")
+            if o["deletes"]: lines[-1] += f", delete **{o['deletes']}** duplicates"
+    writes = f"{c['writes_min']}" if c["writes_min"] == c["writes_max"] else f"{c['writes_min']}–{c['writes_max']}"
+    lines.append(f"Sheets requests ({plan.base.kind} store): reads {c['reads']}, writes {writes} "
+                 f"(~{c['minutes']} min of quota at most). Diffs: `!backfill_details plan`.")
+    return "\n".join(lines)
+
 @bot.command(name="backfill_tickets")
 @cmd_enabled(ENABLE_CMD_BACKFILL)
-async def cmd_backfill(ctx):
+async def cmd_backfill(ctx, *flags: str):
     if backfill_state["running"]:
         return await ctx.reply("A backfill is already running. Use !backfill_status.", mention_author=False)
-    backfill_state["running"] = True; backfill_state["last_msg"] = ""
-    progress_msg = await ctx.reply("Starting backfill…", mention_author=False)
-
-    async def progress_loop():
-        while backfill_state["running"]:
-            try: await progress_msg.edit(content=_render_status())
-            except Exception: pass
-            await asyncio.sleep(5.0)
-    updater_task = asyncio.create_task(progress_loop())
-
+    flags = {f.strip().lower().lstrip("-") for f in flags}
+    full = "full" in flags
+    if "plan" in flags:
+        return await _backfill_command(ctx, _DryRunCheckpoint(full), f"Planning {'full' if full else 'incremental'} backfill (no writes)…",
+                                       plan=_PlanStore(ticket_store()))
+    await _backfill_command(ctx, BackfillRun.start(full), f"Starting {'full' if full else 'incremental'} backfill…")
+
+@bot.command(name="backfill_resume")
+@cmd_enabled(ENABLE_CMD_BACKFILL)
+async def cmd_backfill_resume(ctx):
+    if backfill_state["running"]:
+        return await ctx.reply("A backfill is already running. Use !backfill_status.", mention_author=False)
+    run = BackfillRun.resumable()
+    if not run:
+        return await ctx.reply("Nothing to resume: the last backfill finished.", mention_author=False)
+    await _backfill_command(ctx, run, f"Resuming {'full' if run.full else 'incremental'} backfill #{run.id}…")
+
+async def _backfill_command(ctx, run: BackfillRun, intro: str, plan: Optional[_PlanStore] = None):
+    backfill_state["running"] = True; backfill_state["plan"] = plan is not None
+    state = _run_state()
+    state["last_msg"] = ""; state["full"] = run.full
+    spill = _run_spill()
+    progress = _ProgressReporter(await ctx.reply(intro, mention_author=False), BACKFILL_PROGRESS_SEC)
     try:
-        async def tick():
-            try: await progress_msg.edit(content=_render_status())
-            except Exception: pass
-
-        if ENABLE_WELCOME_SCAN and WELCOME_CHANNEL_ID:
-            ch = bot.get_channel(WELCOME_CHANNEL_ID)
-            if isinstance(ch, discord.TextChannel):
-                await scan_welcome_channel(ch, progress_cb=tick)
-        if ENABLE_PROMO_SCAN and PROMO_CHANNEL_ID:
-            ch2 = bot.get_channel(PROMO_CHANNEL_ID)
-            if isinstance(ch2, discord.TextChannel):
-                await scan_promo_channel(ch2, progress_cb=tick)
+        await run_backfill(run, progress_cb=progress.poke, store=plan)
     finally:
         backfill_state["running"] = False
-        try: updater_task.cancel()
-        except Exception: pass
-
-    await progress_msg.edit(content=_render_status() + "\nDone.")
+        await progress.close("\nDone.")
+        backfill_state["plan"] = False  # !backfill_status goes back to the last real run
 
-    if POST_BACKFILL_SUMMARY:
+    if plan:
+        await ctx.send(_render_plan(plan))
+    elif POST_BACKFILL_SUMMARY:
         w = backfill_state["welcome"]; p = backfill_state["promo"]
-        def _fmt_list(ids: List[str], max_items=10) -> str:
+        def _fmt_list(ids: List[str], total: int) -> str:
             if not ids: return "—"
-            show = ids[:max_items]; extra = len(ids) - len(show)
-            return ", ".join(show) + (f" …(+{extra})" if extra>0 else "")
+            extra = total - len(ids)
+            return ", ".join(ids) + (f" …(+{extra})" if extra>0 else "")
         msg = (
-            "**Backfill report (top 10 each)**\n"
-            f"**Welcome** added: {len(w['added_ids'])} — {_fmt_list(w['added_ids'])}\n"
-            f"updated: {len(w['updated_ids'])} — {_fmt_list(w['updated_ids'])}\n"
-            f"skipped: {len(w['skipped_ids'])} — {_fmt_list(w['skipped_ids'])}\n"
-            f"**Promo** added: {len(p['added_ids'])} — {_fmt_list(p['added_ids'])}\n"
-            f"updated: {len(p['updated_ids'])} — {_fmt_list(p['updated_ids'])}\n"
-            f"skipped: {len(p['skipped_ids'])} — {_fmt_list(p['skipped_ids'])}\n"
+            f"**Backfill report (first {BACKFILL_SAMPLE_MAX} each)**\n"
+            f"**Welcome** added: {w['added']} — {_fmt_list(w['added_ids'], w['added'])}\n"
+            f"updated: {w['updated']} — {_fmt_list(w['updated_ids'], w['updated'])}\n"
+            f"skipped: {w['skipped']} — {_fmt_list(w['skipped_ids'], w['skipped'])}\n"
+            f"**Promo** added: {p['added']} — {_fmt_list(p['added_ids'], p['added'])}\n"
+            f"updated: {p['updated']} — {_fmt_list(p['updated_ids'], p['updated'])}\n"
+            f"skipped: {p['skipped']} — {_fmt_list(p['skipped_ids'], p['skipped'])}\n"
         )
         await ctx.send(msg)
 
     if AUTO_POST_BACKFILL_DETAILS:
-        data = _build_backfill_details_text()
-        ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        buf = io.BytesIO(data.encode("utf-8"))
-        await ctx.send(file=discord.File(buf, filename=f"backfill_details_{ts}.txt"))
+        await _send_backfill_details(ctx.send, ctx.guild, spill)
 
 @bot.command(name="backfill_stop")
 async def cmd_backfill_stop(ctx):
     if not backfill_state["running"]:
         return await ctx.reply("No backfill is running.", mention_author=False)
     backfill_state["running"] = False
-    backfill_state["last_msg"] = "cancel requested"
-    await ctx.reply("Stopping backfill… will halt after the current thread.", mention_author=False)
+    _run_state()["last_msg"] = "cancel requested"
+    await ctx.reply("Stopping backfill… will halt after the current thread. `!backfill_resume` continues it.", mention_author=False)
 
 @bot.command(name="backfill_details")
-async def cmd_backfill_details(ctx: commands.Context):
-    data = _build_backfill_details_text()
-    ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    buf = io.BytesIO(data.encode("utf-8"))
-    await ctx.reply(file=discord.File(buf, filename=f"backfill_details_{ts}.txt"), mention_author=False)
+async def cmd_backfill_details(ctx: commands.Context, which: str = ""):
+    spill = _plan_spill if which.strip().lower().lstrip("-") == "plan" else _details_spill
+    await _send_backfill_details(functools.partial(ctx.reply, mention_author=False), ctx.guild, spill)
 
 @bot.command(name="clan_tags_debug")
 async def cmd_clan_tags_debug(ctx):
-    tags = await _run_blocking(_load_clan_tags, True)
+    tags = await _load_clan_tags(True)
     norm_set = { _normalize_dashes(t).upper() for t in tags }
     has_fit = "F-IT" in norm_set
     sample = ", ".join(list(tags)[:20]) or "(none)"
@@ -1279,14 +3309,22 @@ async def cmd_clan_tags_debug(ctx):
 
 @bot.command(name="dedupe_sheet")
 @cmd_enabled(ENABLE_CMD_DEDUPE)
-async def cmd_dedupe(ctx):
+async def cmd_dedupe(ctx, mode: str = ""):
     try:
-        ws1, ws4 = await asyncio.gather(
-            _run_blocking(get_ws, SHEET1_NAME, HEADERS_SHEET1),
-            _run_blocking(get_ws, SHEET4_NAME, HEADERS_SHEET4),
+        store = ticket_store()
+        vals1, vals4 = await asyncio.gather(store.values(SHEET1_NAME), store.values(SHEET4_NAME))
+        p1 = dedupe_preview(vals1, False); p4 = dedupe_preview(vals4, True)
+        await ctx.reply(
+            "**Dedupe plan**\n"
+            f"{SHEET1_NAME}: {p1['rows']} rows → **{p1['dupes']}** dupes in {p1['ranges']} range(s)\n"
+            f"{SHEET4_NAME}: {p4['rows']} rows → **{p4['dupes']}** dupes in {p4['ranges']} range(s)\n"
+            f"Cost: 2 reads (done) + 2 re-reads at delete time + **{p1['requests'] + p4['requests']}** batchUpdate request(s)",
+            mention_author=False
         )
-        kept1, deleted1 = await _run_blocking(dedupe_sheet, SHEET1_NAME, ws1, False)
-        kept4, deleted4 = await _run_blocking(dedupe_sheet, SHEET4_NAME, ws4, True)
+        if mode.strip().lower() in ("preview", "--preview", "plan"):
+            return
+        kept1, deleted1 = await store.dedupe(SHEET1_NAME, vals1)
+        kept4, deleted4 = await store.dedupe(SHEET4_NAME, vals4)
         await ctx.reply(
             f"Sheet1: kept **{kept1}** unique tickets, deleted **{deleted1}** dupes.\n"
             f"Sheet4: kept **{kept4}** unique (ticket+type+created), deleted **{deleted4}** dupes.",
@@ -1298,9 +3336,15 @@ async def cmd_dedupe(ctx):
 @bot.command(name="reload")
 @cmd_enabled(ENABLE_CMD_RELOAD)
 async def cmd_reload(ctx):
-    _ws_cache.clear(); _index_simple.clear(); _index_promo.clear()
-    global _gs_client, _clan_tags_cache, _clan_tags_norm_set, _last_clan_fetch, _tag_regex_cache
-    _gs_client = None; _clan_tags_cache = []; _clan_tags_norm_set = set(); _last_clan_fetch = 0.0; _tag_regex_cache=None
+    await ticket_store().flush()
+    _ws_cache.clear(); _index_simple.clear(); _index_promo.clear(); _index_promo_pair.clear(); _promo_rows.clear(); _mirror.clear()
+    fp_clear()
+    global _sheets, _clan_tags_cache, _clan_tags_norm_set, _last_clan_fetch, _clan_tags_hash, _clan_tag_col
+    old, _sheets = _sheets, None
+    if old: await old.close()
+    _clan_tags_cache = []; _clan_tags_norm_set = set(); _last_clan_fetch = 0.0
+    _rebuild_tag_matcher()
+    _clan_tags_hash = ""; _clan_tag_col = None
     await ctx.reply("Caches cleared. Reconnect to Sheets on next use.", mention_author=False)
 
 @bot.command(name="health")
@@ -1308,26 +3352,27 @@ async def cmd_reload(ctx):
 async def cmd_health(ctx):
     lat = int(bot.latency*1000)
     try:
-        ws1 = await _run_blocking(get_ws, SHEET1_NAME, HEADERS_SHEET1)
+        ws1 = await get_ws(SHEET1_NAME, HEADERS_SHEET1)
         ok = f"🟢 OK ({ws1.title})"
     except Exception:
         ok = "🔴 FAILED"
-    await ctx.reply(f"🟢 Bot OK | Latency: {lat} ms | Sheets: {ok} | Uptime: {uptime_str()}", mention_author=False)
+    await ctx.reply(
+        f"🟢 Bot OK | Latency: {lat} ms | Sheets: {ok} | Uptime: {uptime_str()}\n"
+        f"Store: {ticket_store().kind} | Sheets budget: {_sheets_budget.render()} | circuit: {_sheets_breaker.render()} | "
+        f"journal pending: {journal_pending_count()}",
+        mention_author=False
+    )
 
 @bot.command(name="checksheet")
 @cmd_enabled(ENABLE_CMD_CHECKSHEET)
 async def cmd_checksheet(ctx):
     try:
-        ws1, ws4 = await asyncio.gather(
-            _run_blocking(get_ws, SHEET1_NAME, HEADERS_SHEET1),
-            _run_blocking(get_ws, SHEET4_NAME, HEADERS_SHEET4),
-        )
-        rows1, rows4 = await asyncio.gather(
-            _run_blocking(ws1.col_values, 1),
-            _run_blocking(ws4.col_values, 1),
-        )
+        store = ticket_store()
+        counts = await store.row_counts()
+        extra = f" | Sheets sync pending: {store.outbox_count()}" if isinstance(store, _MirrorStore) else ""
         await ctx.reply(
-            f"{SHEET1_NAME} rows: {len(rows1)} | {SHEET4_NAME} rows: {len(rows4)}",
+            f"{SHEET1_NAME} rows: {counts[SHEET1_NAME]} | {SHEET4_NAME} rows: {counts[SHEET4_NAME]} "
+            f"(store: {store.kind}){extra}",
             mention_author=False
         )
     except Exception as e:
@@ -1489,6 +3534,11 @@ async def on_ready():
     if _refresh_task is None or _refresh_task.done():
         _refresh_task = bot.loop.create_task(scheduled_refresh_loop())
 
+    # Replay finalized rows that never reached Sheets (restart, outage).
+    _kick_journal_replay()
+    if isinstance(ticket_store(), _MirrorStore):
+        bot.loop.create_task(ticket_store().flush())
+
 @bot.event
 async def on_disconnect():
     _hb.note_disconnected()
@@ -1568,6 +3618,10 @@ def _health_payload() -> tuple[dict, int]:
         "last_event_age_s": age,
         "latency_s": latency,
         "disconnected_age_s": _hb.disconnected_age_s(),
+        "sheets_budget": _sheets_budget.snapshot(),
+        "sheets_circuit": "open" if _sheets_breaker.is_open else "closed",
+        "journal_pending": journal_pending_count(),
+        "ticket_store": ticket_store().kind,
     }
     return body, status
 
@@ -1667,12 +3721,11 @@ async def scheduled_refresh_loop():
         await _sleep_until(next_dt)
 
         try:
-            await _run_blocking(_load_clan_tags, True)
+            await _load_clan_tags(True)
             try:
-                await asyncio.gather(
-                    _run_blocking(get_ws, SHEET1_NAME, HEADERS_SHEET1),
-                    _run_blocking(get_ws, SHEET4_NAME, HEADERS_SHEET4),
-                )
+                store = ticket_store()
+                await store.flush()
+                await asyncio.gather(store.load(SHEET1_NAME), store.load(SHEET4_NAME))
             except Exception:
                 pass
 
@@ -1685,19 +3738,13 @@ async def scheduled_refresh_loop():
                     except Exception:
                         pass
 
-            print("[refresh] clan tags + sheet handles refreshed", flush=True)
+            print("[refresh] clan tags + sheet handles + row mirrors refreshed", flush=True)
         except Exception as e:
             print(f"[refresh] failed: {type(e).__name__}: {e}", flush=True)
 
 _pending_welcome: Dict[int, Dict[str, Any]] = {}
 _pending_promo:   Dict[int, Dict[str, Any]] = {}
 
-def _is_thread_in_parent(thread: discord.Thread, parent_id: int) -> bool:
-    try:
-        return thread and thread.parent_id == parent_id
-    except Exception:
-        return False
-
 @bot.event
 async def on_thread_create(thread: discord.Thread):
     try:
@@ -1715,78 +3762,65 @@ async def on_command_error(ctx, error):
     except:
         pass
 
+async def _watch_message(scope: str, th: discord.Thread, message: discord.Message, scan: MessageScan,
+                         enabled: bool, parse, finalize, pending: Dict[int, dict]):
+    """Shared live-watch flow for a message in a welcome/promo thread: digest, close marker, tag reply."""
+    digest_note_message(th, scan)
+    if bot.user and bot.user.mentioned_in(message):
+        try: await th.join()
+        except Exception: pass
+    if not (ENABLE_LIVE_WATCH and enabled):
+        return
+    if scan.closed:
+        parsed = parse(th.name or "")
+        if parsed:
+            ticket, username, tag = parsed
+            close_dt = message.created_at
+            log_action(scope, "close_detected", ticket=_fmt_ticket(ticket), username=username, clantag=tag or "", link=thread_link(th))
+            if tag:
+                await finalize(th, ticket, username, tag, close_dt)
+            else:
+                pending[th.id] = {"ticket": ticket, "username": username, "close_dt": close_dt}
+                log_action(scope, "pending_set", ticket=_fmt_ticket(ticket), username=username, link=thread_link(th))
+    elif th.id in pending and not message.author.bot:
+        tag = scan.tag
+        if tag:
+            info = pending.pop(th.id, {})
+            ticket = info.get("ticket"); username = info.get("username"); close_dt = info.get("close_dt")
+            if ticket and username:
+                log_action(scope, "tag_received", ticket=_fmt_ticket(ticket), clantag=tag, link=thread_link(th))
+                await finalize(th, ticket, username, tag, close_dt)
+                try:
+                    await th.send(f"Got it — set clan tag to **{tag}** and logged to the sheet. ✅")
+                except Exception:
+                    pass
+
+async def _on_welcome_message(th: discord.Thread, message: discord.Message, scan: MessageScan):
+    await _watch_message("welcome", th, message, scan, ENABLE_LIVE_WATCH_WELCOME,
+                         parse_welcome_thread_name_allow_missing, _finalize_welcome, _pending_welcome)
+
+async def _on_promo_message(th: discord.Thread, message: discord.Message, scan: MessageScan):
+    await _watch_message("promo", th, message, scan, ENABLE_LIVE_WATCH_PROMO,
+                         parse_promo_thread_name, _finalize_promo, _pending_promo)
+
+# Thread parent id -> handler. Messages anywhere else only reach the command parser.
+_message_routes = {cid: handler for cid, handler in ((WELCOME_CHANNEL_ID, _on_welcome_message),
+                                                     (PROMO_CHANNEL_ID, _on_promo_message)) if cid}
+
 @bot.event
 async def on_message(message: discord.Message):
-    if isinstance(message.channel, discord.Thread):
-        th = message.channel
-
-        try:
-            if th.id in _pending_welcome or th.id in _pending_promo:
+    th = message.channel
+    if isinstance(th, discord.Thread):
+        if th.id in _pending_welcome or th.id in _pending_promo:
+            try:
                 if not getattr(th, "archived", False) and not getattr(th, "locked", False):
                     _pending_welcome.pop(th.id, None)
                     _pending_promo.pop(th.id, None)
-        except Exception:
-            pass
-        if th.parent_id in {WELCOME_CHANNEL_ID, PROMO_CHANNEL_ID}:
-            if bot.user and bot.user.mentioned_in(message):
-                try: await th.join()
-                except Exception: pass
-
-        # WELCOME watcher
-        if ENABLE_LIVE_WATCH and ENABLE_LIVE_WATCH_WELCOME and _is_thread_in_parent(th, WELCOME_CHANNEL_ID):
-            text = _aggregate_msg_text(message)
-            if is_close_marker(text):
-                parsed = parse_welcome_thread_name_allow_missing(th.name or "")
-                if parsed:
-                    ticket, username, tag = parsed
-                    close_dt = message.created_at
-                    log_action("welcome", "close_detected", ticket=_fmt_ticket(ticket), username=username, clantag=tag or "", link=thread_link(th))
-                    if tag:
-                        await _finalize_welcome(th, ticket, username, tag, close_dt)
-                    else:
-                        _pending_welcome[th.id] = {"ticket": ticket, "username": username, "close_dt": close_dt}
-                        log_action("welcome", "pending_set", ticket=_fmt_ticket(ticket), username=username, link=thread_link(th))
-            elif th.id in _pending_welcome:
-                if not message.author.bot:
-                    tag = _match_tag_in_text(_aggregate_msg_text(message))
-                    if tag:
-                        info = _pending_welcome.pop(th.id, {})
-                        ticket = info.get("ticket"); username = info.get("username"); close_dt = info.get("close_dt")
-                        if ticket and username:
-                            log_action("welcome", "tag_received", ticket=_fmt_ticket(ticket), clantag=tag, link=thread_link(th))
-                            await _finalize_welcome(th, ticket, username, tag, close_dt)
-                            try:
-                                await th.send(f"Got it — set clan tag to **{tag}** and logged to the sheet. ✅")
-                            except Exception:
-                                pass
-
-        # PROMO watcher
-        if ENABLE_LIVE_WATCH and ENABLE_LIVE_WATCH_PROMO and _is_thread_in_parent(th, PROMO_CHANNEL_ID):
-            text = _aggregate_msg_text(message)
-            if is_close_marker(text):
-                parsed = parse_promo_thread_name(th.name or "")
-                if parsed:
-                    ticket, username, tag = parsed
-                    close_dt = message.created_at
-                    log_action("promo", "close_detected", ticket=_fmt_ticket(ticket), username=username, clantag=tag or "", link=thread_link(th))
-                    if tag:
-                        await _finalize_promo(th, ticket, username, tag, close_dt)
-                    else:
-                        _pending_promo[th.id] = {"ticket": ticket, "username": username, "close_dt": close_dt}
-                        log_action("promo", "pending_set", ticket=_fmt_ticket(ticket), username=username, link=thread_link(th))
-            elif th.id in _pending_promo:
-                if not message.author.bot:
-                    tag = _match_tag_in_text(_aggregate_msg_text(message))
-                    if tag:
-                        info = _pending_promo.pop(th.id, {})
-                        ticket = info.get("ticket"); username = info.get("username"); close_dt = info.get("close_dt")
-                        if ticket and username:
-                            log_action("promo", "tag_received", ticket=_fmt_ticket(ticket), clantag=tag, link=thread_link(th))
-                            await _finalize_promo(th, ticket, username, tag, close_dt)
-                            try:
-                                await th.send(f"Got it — set clan tag to **{tag}** and logged to the sheet. ✅")
-                            except Exception:
-                                pass
+            except Exception:
+                pass
+        route = _message_routes.get(th.parent_id)
+        if route:
+            await route(th, message, MessageScan(message))
 
     await bot.process_commands(message)
 
@@ -1825,7 +3859,7 @@ async def on_thread_update(before: discord.Thread, after: discord.Thread):
             return
 
         ticket, username, tag = parsed
-        close_dt = await find_close_timestamp(after) or after.updated_at or after.created_at
+        close_dt = (await thread_signals(after)).close_dt or after.updated_at or after.created_at
 
         if scope == "welcome":
             if tag:
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# The bot reads its config at import time; keep the state DB out of the working tree
+os.environ.setdefault("STATE_DB_PATH", os.path.join(tempfile.mkdtemp(), "state.db"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
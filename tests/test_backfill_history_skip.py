@@ -0,0 +1,43 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import bot_welcomecrew as bot
+
+
+class _Base:
+    """Stands in for the real store under _PlanStore: one snapshot per tab."""
+    kind = "sqlite"
+
+    def __init__(self, tabs):
+        self.tabs = tabs
+
+    async def snapshot(self, name):
+        return [list(r) for r in self.tabs.get(name, [])]
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_welcome_history_skip_keeps_tag_for_tagless_name(monkeypatch):
+    # The row already has tag + close date, so no history is read and the name carries no tag
+    monkeypatch.setattr(bot, "_last_clan_fetch", time.time())
+    monkeypatch.setattr(bot, "PRESERVE_EXISTING_NONEMPTY", True)
+    monkeypatch.setitem(bot.backfill_plan_state, "full", True)
+    monkeypatch.setitem(bot.backfill_state, "plan", True)
+    existing = ["0042", "someone", "ABC", "2024-01-02 10:00"]
+    store = bot._PlanStore(_Base({bot.SHEET1_NAME: [list(bot.HEADERS_SHEET1), existing]}))
+    th = SimpleNamespace(id=1, name="0042-someone", created_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+    st = bot._new_bucket()
+
+    async def go():
+        job = await bot._analyze_welcome_thread(th, store, st)
+        assert job.args[1] == ["0042", "someone", "", ""]
+        return await job()
+
+    assert _run(go()) == "unchanged"
+    assert st["history_skipped"] == 1
+    assert not st["skipped_reasons"]
+    assert store.rows[bot.SHEET1_NAME][1] == existing
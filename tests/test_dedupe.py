@@ -0,0 +1,77 @@
+import asyncio
+
+import bot_welcomecrew as bot
+
+
+class _Sheet:
+    id = 7
+
+    def __init__(self, rows):
+        self.values = [list(r) for r in rows]
+        self.spreadsheet = self
+
+    async def get_all_values(self):
+        return [list(r) for r in self.values]
+
+    async def append_rows(self, rows, value_input_option="RAW"):
+        first = len(self.values) + 1
+        self.values += [list(r) for r in rows]
+        return {"updates": {"updatedRange": f"Sheet!A{first}:D{len(self.values)}"}}
+
+    async def batch_update(self, body):
+        if isinstance(body, dict):  # spreadsheet batchUpdate: deleteDimension requests, bottom-up
+            for req in body["requests"]:
+                rng = req["deleteDimension"]["range"]
+                del self.values[rng["startIndex"]:rng["endIndex"]]
+        else:
+            for d in body:
+                row = int(d["range"].split(":")[0][1:])
+                self.values[row - 1] = list(d["values"][0])
+
+    async def row_values(self, row):
+        return list(self.values[row - 1])
+
+
+def _cleanup(name):
+    for table in (bot._index_simple, bot._mirror, bot._write_queues):
+        table.pop(name, None)
+
+
+def test_dedupe_keeps_writes_that_land_after_the_preview(monkeypatch):
+    name = "dedupe-test-welcome"
+    monkeypatch.setattr(bot, "SHEETS_FLUSH_MS", 60_000)
+    ws = _Sheet([bot.HEADERS_SHEET1,
+                 ["0001", "a", "", "2024-01-01 10:00"],
+                 ["0001", "a", "", "2024-01-02 10:00"],
+                 ["0002", "b", "", ""]])
+
+    async def go():
+        await bot.ws_index_welcome(name, ws)
+        st = bot._new_bucket()
+        # Lands between the preview read and the delete
+        await bot.upsert_welcome(name, ws, "3", ["0003", "c", "XYZ", ""], st, on_done=lambda status: None)
+        return await bot.dedupe_sheet(name, ws, False)
+
+    try:
+        assert asyncio.run(go()) == (3, 1)
+        assert [r[0] for r in ws.values[1:]] == ["0001", "0002", "0003"]
+        assert bot._mirror[name] == ws.values
+        assert bot._index_simple[name] == {"0001": 2, "0002": 3, "0003": 4}
+    finally:
+        _cleanup(name)
+
+
+def test_rebase_moves_pending_updates_past_deleted_rows():
+    name = "dedupe-test-rebase"
+    q = bot._WriteBehind(name)
+    q.updates = {2: {"values": ["0001", "a", "TAG", ""], "waiters": []},
+                 5: {"values": ["0004", "d", "", ""], "waiters": []}}
+    bot._index_simple[name] = {"0001": 2, "0004": 3}
+    try:
+        # Rows 2 and 3 were dropped; row 2's ticket survives at row 2 (the old row 4)
+        q.rebase([2, 3], lambda values: bot._resolve_row(name, values))
+    finally:
+        _cleanup(name)
+    assert sorted(q.updates) == [2, 3]
+    assert q.updates[2]["values"][2] == "TAG"
+    assert q.updates[3]["values"][0] == "0004"
@@ -0,0 +1,68 @@
+import asyncio
+
+import bot_welcomecrew as bot
+
+
+class _Sheet:
+    def __init__(self, header):
+        self.values = [list(header)]
+        self.reads = 0
+
+    async def get_all_values(self):
+        self.reads += 1
+        return [list(r) for r in self.values]
+
+    async def append_rows(self, rows, value_input_option="RAW"):
+        first = len(self.values) + 1
+        self.values += [list(r) for r in rows]
+        return {"updates": {"updatedRange": f"Sheet!A{first}:D{len(self.values)}"}}
+
+    async def batch_update(self, data):
+        for d in data:
+            row = int(d["range"].split(":")[0][1:])
+            self.values[row - 1] = list(d["values"][0])
+
+    async def row_values(self, row):
+        return list(self.values[row - 1])
+
+
+def _forget(name):
+    for table in (bot._index_simple, bot._mirror, bot._write_queues):
+        table.pop(name, None)
+    bot.fp_clear(name)
+
+
+def test_cells_cleared_by_hand_are_filled_again_after_reload(monkeypatch):
+    name = "fp-test-manual-edit"
+    monkeypatch.setattr(bot, "SHEETS_FLUSH_MS", 0)
+    ws = _Sheet(bot.HEADERS_SHEET1)
+    row = ["0042", "a", "ABC", "2024-01-01 10:00"]
+
+    async def go():
+        st = bot._new_bucket()
+        first = await bot.upsert_welcome(name, ws, "42", row, st)
+        ws.values[1] = ["0042", "", "", ""]  # someone blanks the row in the sheet
+        bot._index_simple.pop(name); bot._mirror.pop(name)  # what !reload drops
+        return first, await bot.upsert_welcome(name, ws, "42", row, st)
+
+    try:
+        assert asyncio.run(go()) == ("inserted", "updated")
+    finally:
+        _forget(name)
+    assert ws.values[1] == row
+
+
+def test_fingerprint_still_saves_the_read_without_a_mirrored_row(monkeypatch):
+    name = "fp-test-no-mirror"
+    ws = _Sheet(bot.HEADERS_SHEET1)
+    row = ["0042", "a", "ABC", ""]
+    bot.fp_put(name, "0042", row)
+    bot._index_simple[name] = {"0042": 2}  # index without a mirror (e.g. patched by an append)
+    try:
+        status = asyncio.run(bot._queue_update(name, ws, 2, row, bot.HEADERS_SHEET1, bot._new_bucket(),
+                                               "0042", "Welcome", key="0042"))
+        assert status == "unchanged"
+        bot.fp_clear(name)
+        assert not bot.fp_matches(name, "0042", row)
+    finally:
+        _forget(name)
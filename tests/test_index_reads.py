@@ -0,0 +1,92 @@
+import asyncio
+
+import bot_welcomecrew as bot
+
+
+class _FlakySheet:
+    """Worksheet holding ticket 0042 whose first full read fails."""
+
+    def __init__(self, header, rows, fail_reads=1):
+        self.values = [list(header)] + [list(r) for r in rows]
+        self.fail_reads = fail_reads
+        self.appends = []
+
+    async def get_all_values(self):
+        if self.fail_reads:
+            self.fail_reads -= 1
+            raise bot.SheetsUnavailable("circuit open")
+        return [list(r) for r in self.values]
+
+    async def append_rows(self, rows, value_input_option="RAW"):
+        self.appends.append([list(r) for r in rows])
+        first = len(self.values) + 1
+        self.values += [list(r) for r in rows]
+        return {"updates": {"updatedRange": f"Sheet!A{first}:F{len(self.values)}"}}
+
+    async def batch_update(self, data):
+        for d in data:
+            row = int(d["range"].split(":")[0][1:])
+            self.values[row - 1] = list(d["values"][0])
+
+    async def row_values(self, row):
+        return list(self.values[row - 1])
+
+
+def _forget(name):
+    for table in (bot._index_simple, bot._index_promo, bot._index_promo_pair, bot._promo_cols, bot._mirror,
+                  bot._write_queues):
+        table.pop(name, None)
+
+
+def test_failed_index_read_is_not_cached_as_empty(monkeypatch):
+    name = "index-test-welcome"
+    monkeypatch.setattr(bot, "SHEETS_FLUSH_MS", 0)
+    ws = _FlakySheet(bot.HEADERS_SHEET1, [["0042", "a", "", ""]])
+
+    async def go():
+        st = bot._new_bucket()
+        first = await bot.upsert_welcome(name, ws, "42", ["0042", "a", "ABC", ""], st)
+        second = await bot.upsert_welcome(name, ws, "42", ["0042", "a", "ABC", ""], st)
+        return first, second
+
+    try:
+        assert asyncio.run(go()) == ("error", "updated")
+    finally:
+        _forget(name)
+    assert ws.appends == []
+    assert ws.values[1:] == [["0042", "a", "ABC", ""]]
+
+
+def test_failed_promo_index_read_is_not_cached_as_empty(monkeypatch):
+    name = "index-test-promo"
+    monkeypatch.setattr(bot, "SHEETS_FLUSH_MS", 0)
+    row = ["0042", "a", "", "", "returning player", "2024-01-01 10:00"]
+    ws = _FlakySheet(bot.HEADERS_SHEET4, [row])
+
+    async def go():
+        st = bot._new_bucket()
+        args = ("42", "returning player", "2024-01-01 10:00", row[:2] + ["ABC"] + row[3:], st)
+        return await bot.upsert_promo(name, ws, *args), await bot.upsert_promo(name, ws, *args)
+
+    try:
+        assert asyncio.run(go()) == ("error", "updated")
+    finally:
+        _forget(name)
+    assert ws.appends == []
+
+
+def test_miss_against_an_index_without_a_full_read_reads_again(monkeypatch):
+    name = "index-test-partial"
+    monkeypatch.setattr(bot, "SHEETS_FLUSH_MS", 0)
+    ws = _FlakySheet(bot.HEADERS_SHEET1, [["0042", "a", "", ""]], fail_reads=0)
+    # e.g. an append response patched an index that `!reload` had just cleared
+    bot._index_simple[name] = {"0099": 7}
+
+    async def go():
+        return await bot.upsert_welcome(name, ws, "42", ["0042", "a", "ABC", ""], bot._new_bucket())
+
+    try:
+        assert asyncio.run(go()) == "updated"
+    finally:
+        _forget(name)
+    assert ws.appends == []
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+import bot_welcomecrew as bot
+
+
+class _Base:
+    kind = "sheets"
+
+    def __init__(self, tabs):
+        self.tabs = tabs
+
+    async def snapshot(self, name):
+        return [list(r) for r in self.tabs[name]]
+
+
+def test_ticket_store_is_abstract():
+    with pytest.raises(TypeError):
+        bot.TicketStore()
+
+
+def test_plan_dedupe_records_deletes_without_touching_the_base():
+    rows = [list(bot.HEADERS_SHEET1),
+            ["0042", "a", "ABC", "2024-01-01 10:00"],
+            ["0042", "a", "ABC", "2024-01-03 10:00"],
+            ["0043", "b", "", ""]]
+    base = _Base({bot.SHEET1_NAME: rows})
+    plan = bot._PlanStore(base)
+
+    assert asyncio.run(plan.dedupe(bot.SHEET1_NAME)) == (2, 1)
+    assert plan.ops[bot.SHEET1_NAME]["deletes"] == 1
+    assert [r[0] for r in plan.rows[bot.SHEET1_NAME][1:]] == ["0042", "0043"]
+    assert plan.rows[bot.SHEET1_NAME][1][3] == "2024-01-03 10:00"
+    assert len(base.tabs[bot.SHEET1_NAME]) == 4
+    assert plan.cost()["writes_min"] == 1
+
+
+def test_sheets_snapshot_never_creates_a_missing_tab(monkeypatch):
+    calls = []
+
+    class _Spreadsheet:
+        async def batch_update(self, body):
+            calls.append(body)
+
+    async def open_spreadsheet():
+        return _Spreadsheet(), {"sheets": []}
+
+    monkeypatch.setattr(bot, "_open_spreadsheet", open_spreadsheet)
+    monkeypatch.setattr(bot, "_ws_cache", {})
+    assert asyncio.run(bot._SheetsStore().snapshot("no-such-tab")) == []
+    assert calls == []
+
+
+def test_plan_run_details_do_not_replace_the_last_real_run(monkeypatch):
+    real, dry = bot._DetailSpill(), bot._DetailSpill()
+    monkeypatch.setattr(bot, "_details_spill", real)
+    monkeypatch.setattr(bot, "_plan_spill", dry)
+    monkeypatch.setitem(bot.backfill_state, "welcome", bot._new_report_bucket())
+    bucket = bot._new_bucket()
+    bucket["updated_details"].append("0042: clantag: '' → 'ABC'")
+    try:
+        monkeypatch.setitem(bot.backfill_state, "plan", False)
+        bot._fold_report("welcome", bucket)
+        monkeypatch.setitem(bot.backfill_state, "plan", True)
+        bot._run_spill().reset()
+        bot._fold_report("welcome", bucket)
+        real.flush()
+        with open(real._path("welcome_updated.txt"), encoding="utf-8") as f:
+            assert f.read().count("0042") == 1
+    finally:
+        real.close(); dry.close()
+
+
+def test_plan_run_leaves_the_real_report_alone(monkeypatch):
+    real = bot._new_report_bucket()
+    real["updated"] = 3; real["updated_ids"] = ["0042"]
+    monkeypatch.setitem(bot.backfill_state, "welcome", real)
+    monkeypatch.setitem(bot.backfill_state, "last_msg", "real run")
+    monkeypatch.setitem(bot.backfill_state, "full", True)
+    monkeypatch.setitem(bot.backfill_state, "plan", True)
+    monkeypatch.setattr(bot, "ENABLE_WELCOME_SCAN", False)
+    monkeypatch.setattr(bot, "ENABLE_PROMO_SCAN", False)
+    monkeypatch.setattr(bot, "backfill_plan_state", {"full": False, "welcome": bot._new_report_bucket(),
+                                                     "promo": bot._new_report_bucket(), "last_msg": ""})
+    bucket = bot._new_bucket()
+    bucket["added"] = 1; bucket["added_ids"].append("0043")
+
+    asyncio.run(bot.run_backfill(bot._DryRunCheckpoint(False), store=bot._PlanStore(_Base({}))))
+    bot._fold_report("welcome", bucket)
+
+    assert bot.backfill_state["welcome"] is real
+    assert real["updated"] == 3 and real["added"] == 0
+    assert bot.backfill_state["last_msg"] == "real run"
+    assert bot.backfill_plan_state["welcome"]["added"] == 1
+    assert "scan disabled" in bot.backfill_plan_state["last_msg"]
+    monkeypatch.setitem(bot.backfill_state, "plan", False)
+    assert "updated: **3**" in bot._render_status()
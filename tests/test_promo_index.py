@@ -0,0 +1,52 @@
+import bot_welcomecrew as bot
+
+
+def test_rewritten_row_hands_its_pair_to_the_next_row_with_it():
+    name = "promo-index-test"
+    values = [list(bot.HEADERS_SHEET4),
+              ["0042", "a", "", "", "returning player", "2024-01-01 10:00"],
+              ["0042", "a", "", "", "returning player", "2024-02-01 10:00"]]
+    bot._mirror[name] = values
+    bot._index_promo_values(name, values)
+    try:
+        after = ["0042", "a", "", "", "player move request", "2024-01-01 10:00"]
+        bot._reindex_promo_row(name, 2, values[1], after)
+        assert bot._find_promo_row_pair(name, "0042", "returning player") == 3
+        assert bot._find_promo_row_pair(name, "0042", "player move request") == 2
+    finally:
+        for table in (bot._mirror, bot._index_promo, bot._index_promo_pair, bot._promo_rows, bot._promo_cols):
+            table.pop(name, None)
+
+
+def test_rewritten_duplicate_keeps_the_composite_key_on_its_twin():
+    name = "promo-index-test-dup"
+    row = ["0042", "a", "", "", "returning player", "2024-01-01 10:00"]
+    values = [list(bot.HEADERS_SHEET4), list(row), list(row)]
+    bot._mirror[name] = values
+    bot._index_promo_values(name, values)
+    key = bot._key_promo("0042", "returning player", "2024-01-01 10:00")
+    try:
+        bot._reindex_promo_row(name, 3, row, row[:4] + ["player move request", row[5]])
+        assert bot._index_promo[name][key] == 2
+    finally:
+        for table in (bot._mirror, bot._index_promo, bot._index_promo_pair, bot._promo_rows, bot._promo_cols):
+            table.pop(name, None)
+
+
+def test_rewrite_bookkeeping_does_not_scan_the_tab():
+    name = "promo-index-test-flat"
+    values = [list(bot.HEADERS_SHEET4)] + [
+        [f"{i:04d}", "a", "", "", "returning player", "2024-01-01 10:00"] for i in range(1, 2001)]
+    values.append(list(values[1]))  # one duplicate of ticket 0001, at the bottom
+    bot._index_promo_values(name, values)
+    calls = []
+    real = bot._promo_fields
+    try:
+        bot._promo_fields = lambda n, row: calls.append(1) or real(n, row)
+        bot._reindex_promo_row(name, 2, values[1], values[1][:4] + ["player move request", values[1][5]])
+        assert bot._find_promo_row_pair(name, "0001", "returning player") == 2002
+    finally:
+        bot._promo_fields = real
+        for table in (bot._index_promo, bot._index_promo_pair, bot._promo_rows, bot._promo_cols):
+            table.pop(name, None)
+    assert len(calls) == 2
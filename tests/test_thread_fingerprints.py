@@ -0,0 +1,21 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import bot_welcomecrew as bot
+
+
+def _thread(tid):
+    return SimpleNamespace(id=tid, name=f"{tid % 10000:04d}-someone", last_message_id=5,
+                           archive_timestamp=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+
+def test_untagged_thread_is_analyzed_again_when_the_clanlist_changes(monkeypatch):
+    monkeypatch.setattr(bot, "_clan_tags_hash", "tags-v1")
+    untagged, tagged = _thread(710001), _thread(710002)
+    bot.thread_synced(untagged, "welcome", tagged=False)
+    bot.thread_synced(tagged, "welcome")
+    assert bot.thread_unchanged(untagged) and bot.thread_unchanged(tagged)
+
+    monkeypatch.setattr(bot, "_clan_tags_hash", "tags-v2")
+    assert not bot.thread_unchanged(untagged)
+    assert bot.thread_unchanged(tagged)
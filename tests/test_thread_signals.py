@@ -0,0 +1,37 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import bot_welcomecrew as bot
+
+
+def test_digest_gap_falls_back_to_history(monkeypatch):
+    # A digest from a watched thread still misses messages sent before the join / during a reconnect
+    closed = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    walks = []
+
+    async def history(thread, want_close=True, want_type=False, want_tag=False):
+        walks.append((want_close, want_type, want_tag))
+        sig = bot.ThreadSignals()
+        sig.promo_type = "returning player"
+        return sig
+
+    monkeypatch.setattr(bot, "analyze_thread_history", history)
+
+    async def join():
+        pass
+
+    th = SimpleNamespace(id=987654321, parent_id=bot.PROMO_CHANNEL_ID, join=join)
+    bot._digests.pop(th.id, None)
+
+    async def go():
+        await bot.on_thread_create(th)  # watched from creation, yet the intro went by unseen
+        bot._digest_for(th.id).close_dt = closed
+        return await bot.thread_signals(th, want_close=True, want_type=True)
+
+    try:
+        sig = asyncio.run(go())
+    finally:
+        bot._digests.pop(th.id, None)
+    assert walks == [(False, True, False)]
+    assert (sig.close_dt, sig.promo_type) == (closed, "returning player")
@@ -0,0 +1,100 @@
+import asyncio
+
+import bot_welcomecrew as bot
+
+
+class _SlowSheet:
+    """Worksheet whose append only answers once `release` is set."""
+
+    def __init__(self, header):
+        self.values = [list(header)]
+        self.appends = []
+        self.updates = []
+        self.release = asyncio.Event()
+
+    async def get_all_values(self):
+        return [list(r) for r in self.values]
+
+    async def append_rows(self, rows, value_input_option="RAW"):
+        self.appends.append([list(r) for r in rows])
+        await self.release.wait()
+        first = len(self.values) + 1
+        self.values += [list(r) for r in rows]
+        return {"updates": {"updatedRange": f"Sheet!A{first}:D{len(self.values)}"}}
+
+    async def batch_update(self, data):
+        self.updates.append(data)
+        for d in data:
+            row = int(d["range"].split(":")[0][1:])
+            self.values[row - 1] = list(d["values"][0])
+
+    async def row_values(self, row):
+        return list(self.values[row - 1])
+
+
+def test_upsert_during_inflight_append_updates_instead_of_appending(monkeypatch):
+    name = "wb-test-welcome"
+    monkeypatch.setattr(bot, "SHEETS_FLUSH_MS", 0)
+    monkeypatch.setitem(bot._write_queues, name, bot._WriteBehind(name))
+
+    async def go():
+        ws = _SlowSheet(bot.HEADERS_SHEET1)
+        st = bot._new_bucket()
+        first = asyncio.create_task(bot.upsert_welcome(name, ws, "42", ["0042", "someone", "", ""], st))
+        while not ws.appends:
+            await asyncio.sleep(0)
+        # The append is on the wire: the ticket is in neither the index nor the pending inserts
+        second = asyncio.create_task(bot.upsert_welcome(name, ws, "42", ["0042", "someone", "ABC", ""], st))
+        await asyncio.sleep(0.05)
+        ws.release.set()
+        return ws, await first, await second
+
+    try:
+        ws, s1, s2 = asyncio.run(go())
+    finally:
+        bot._index_simple.pop(name, None)
+        bot._mirror.pop(name, None)
+    assert (s1, s2) == ("inserted", "updated")
+    assert len(ws.appends) == 1
+    assert ws.values[1:] == [["0042", "someone", "ABC", ""]]
+
+
+class _HeldUpdates(_SlowSheet):
+    """Worksheet whose first batch_update only lands once `release` is set."""
+
+    async def batch_update(self, data):
+        held = not self.updates
+        self.updates.append(data)
+        if held:
+            await self.release.wait()
+        for d in data:
+            row = int(d["range"].split(":")[0][1:])
+            self.values[row - 1] = list(d["values"][0])
+
+
+def test_upsert_during_inflight_update_merges_over_the_values_being_sent(monkeypatch):
+    name = "wb-test-update"
+    monkeypatch.setattr(bot, "SHEETS_FLUSH_MS", 0)
+    monkeypatch.setattr(bot, "PRESERVE_EXISTING_NONEMPTY", True)
+    monkeypatch.setitem(bot._write_queues, name, bot._WriteBehind(name))
+
+    async def go():
+        ws = _HeldUpdates(bot.HEADERS_SHEET1)
+        ws.values.append(["0042", "a", "", ""])
+        st = bot._new_bucket()
+        first = asyncio.create_task(bot.upsert_welcome(name, ws, "42", ["0042", "a", "ABC", ""], st))
+        while not ws.updates:
+            await asyncio.sleep(0)
+        # Tag ABC is on the wire; the mirror still has the old row
+        second = asyncio.create_task(bot.upsert_welcome(name, ws, "42", ["0042", "a", "", "2024-01-01 10:00"], st))
+        await asyncio.sleep(0.05)
+        ws.release.set()
+        return ws, await first, await second
+
+    try:
+        ws, s1, s2 = asyncio.run(go())
+    finally:
+        bot._index_simple.pop(name, None)
+        bot._mirror.pop(name, None)
+    assert (s1, s2) == ("updated", "updated")
+    assert ws.values[1:] == [["0042", "a", "ABC", "2024-01-01 10:00"]]